@@ -0,0 +1,269 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+import can
+
+from fast_decoder import FastDecoder
+from signal_store import SignalStore
+from pack_state import PackState
+from can_pipeline import MAX_DRAIN, BusConfig, DecodePipeline, IngestBuffer, dbc_can_filters, filter_ids, open_logged_bus
+
+
+# Bus time after which a quiet bus no longer holds back the merged timeline
+REORDER_WINDOW = 0.05
+
+
+class AsyncBufferListener(can.Listener):
+    """Feeds the bounded IngestBuffer from a Notifier thread and wakes the decode coroutine on the loop.
+
+    Used instead of can.AsyncBufferedReader, whose asyncio.Queue is unbounded.
+    A burst of frames costs one call_soon_threadsafe: later frames see the
+    wakeup still pending and only queue.
+    """
+    def __init__(self, buffer: IngestBuffer, loop: asyncio.AbstractEventLoop, wakeup: asyncio.Event):
+        self.buffer = buffer
+        self.loop = loop
+        self.wakeup = wakeup
+        self._pending = False
+
+    def on_message_received(self, msg: can.Message):
+        self.buffer.put(msg)
+        if not self._pending:
+            self._pending = True
+            self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        # On the loop: frames put after this schedule a new wakeup
+        self._pending = False
+        self.wakeup.set()
+
+    def on_error(self, exc: Exception):
+        print(f"An error occurred in the CAN listener: {exc}")
+
+
+class AsyncIngest:
+    """asyncio ingest core running on one background event loop thread.
+
+    Every bus gets its own IngestBuffer, decoder and log file. Reading and
+    logging stay on a plain can.Notifier thread per bus, so the log writer
+    never waits for a decode pass on the loop. The listener only queues and
+    wakes the loop. Decoding, periodic derived values, log flushing and rate stats are
+    coroutines on the same loop; the log flush also persists new samples to
+    the session history. The GUI talks to it through the same
+    start()/stop()/take_snapshot()/stats() bridge as DecodeWorker.
+
+    With several buses each drain is heap-merged by timestamp, so the shared
+    history is filled in one time-ordered stream across buses. Frames newer than
+    the newest frame seen from the slowest active bus are held back for a later
+    drain. Otherwise a frame that reached its buffer a moment late would land
+    behind newer frames. A bus that has been quiet for REORDER_WINDOW (in bus time
+    or in wall-clock time) doesn't hold the others back. Held frames are also
+    released by a periodic coroutine, so they don't wait for the next frame
+    when every bus went quiet.
+    """
+    def __init__(self, decoders: list[FastDecoder], store: SignalStore, buses: list[BusConfig], displayed_signals: set,
+                 derived: dict | None = None, queue_size: int = 50000, overflow_policy: str = "drop_oldest",
+                 derive_interval: float = 0.1, flush_interval: float = 1.0, stats_interval: float = 1.0,
+                 pack: PackState | None = None):
+        self.bus_configs = buses
+        self.pipeline = DecodePipeline(decoders[0], store, displayed_signals, derived, pack)
+        for decoder, config in zip(decoders[1:], buses[1:]):
+            self.pipeline.add_bus(decoder, config.name)
+        self.can_filters = [dbc_can_filters(decoder.db, config.allow_ids) if config.dbc_filter else None
+                            for decoder, config in zip(decoders, buses)]
+        self.buffers = [IngestBuffer(queue_size, overflow_policy, filter_ids(can_filters), decoder.history_ids)
+                        for decoder, can_filters in zip(decoders, self.can_filters)]
+        self._held = [[] for _ in buses]    # frames past the merge watermark, per bus
+        self._last_seen = [None] * len(buses)   # newest timestamp drained per bus
+        self._arrived = [0.0] * len(buses)      # time.monotonic() of the last drain with frames, per bus
+
+        self.derive_interval = derive_interval
+        self.flush_interval = flush_interval
+        self.stats_interval = stats_interval
+
+        self.connected = False
+        self.rx_rate = 0.0               # frames/s over the last stats interval, all buses
+        self._rate_mark = (0, time.monotonic())
+        self._derived_time = None
+
+        self._buses = {}                 # bus index -> (bus, log_file, log_writer)
+        self._loop = None
+        self._stopping = None
+        self._thread = None
+
+    def start(self):
+        status = []
+        for index, config in enumerate(self.bus_configs):
+            # One log per bus; keep the plain file name when there is only one
+            log_name = config.name if len(self.bus_configs) > 1 else None
+            try:
+                self._buses[index] = open_logged_bus(config.channel, config.bitrate, config.interface, log_name,
+                                                     self.can_filters[index])
+                status.append("Successfully connected to CAN bus.")
+            except Exception as e:
+                status.append(f"Error initializing CAN: {e}")
+        self.connected = bool(self._buses)
+
+        if len(self.bus_configs) > 1:
+            status = [f"{config.name}: {text}" for config, text in zip(self.bus_configs, status)]
+        self.pipeline.post_status(" | ".join(status))
+
+        ready = threading.Event()
+        self._thread = threading.Thread(target=asyncio.run, args=(self._main(ready),), name="can-async", daemon=True)
+        self._thread.start()
+        ready.wait(2.0)
+
+    def stop(self, timeout: float = 2.0):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def queue_depth(self) -> int:
+        return sum(buffer.qsize() for buffer in self.buffers)
+
+    def stats(self) -> dict:
+        """IngestBuffer counters summed over all buses, plus display coalescing and rx rate."""
+        stats = {}
+        for buffer in self.buffers:
+            for key, value in buffer.stats().items():
+                stats[key] = stats.get(key, 0) + value
+        stats["display_coalesced"] = self.pipeline.coalesced_frames
+        stats["rx_rate"] = self.rx_rate
+        return stats
+
+    def take_snapshot(self) -> tuple[dict, dict]:
+        return self.pipeline.take_snapshot()
+
+    def clear(self, sid: int):
+        """Clear a signal's history on the loop thread."""
+        self.pipeline.request_clear(sid)
+        self._wake_requests()
+
+    def post_samples(self, t: float, values: dict):
+        """Append {signal ID: value} at relative time t on the loop thread."""
+        self.pipeline.post_samples(t, values)
+        self._wake_requests()
+
+    def _wake_requests(self):
+        # Derived values follow from last_time in _derive()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.pipeline.apply_requests, False)
+
+    async def _main(self, ready: threading.Event):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        wakeup = asyncio.Event()
+
+        # Not loop-bound: with loop= the Notifier would call the log writer on this thread, behind decoding
+        notifiers = [can.Notifier(bus, [AsyncBufferListener(self.buffers[index], self._loop, wakeup), log_writer])
+                     for index, (bus, _, log_writer) in self._buses.items()]
+
+        tasks = [
+            asyncio.create_task(self._decode(wakeup)),
+            asyncio.create_task(self._every(self.derive_interval, self._derive)),
+            asyncio.create_task(self._every(self.flush_interval, self._flush_logs)),
+            asyncio.create_task(self._every(self.stats_interval, self._update_rates)),
+        ]
+        if len(self.buffers) > 1:
+            tasks.append(asyncio.create_task(self._every(REORDER_WINDOW, self._release_held)))
+        ready.set()
+
+        await self._stopping.wait()
+
+        for notifier in notifiers:
+            notifier.stop()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for bus, log_file, _ in self._buses.values():
+            bus.shutdown()
+            log_file.close()
+
+    async def _decode(self, wakeup: asyncio.Event):
+        while True:
+            await wakeup.wait()
+            wakeup.clear()
+
+            # Derived values have their own coroutine
+            if len(self.buffers) == 1:
+                frames = self.buffers[0].get_batch(MAX_DRAIN, timeout=0)
+                if frames:
+                    self.pipeline.process(frames, derive=False)
+            else:
+                self._process_merged([buffer.get_batch(MAX_DRAIN, timeout=0) for buffer in self.buffers])
+
+            if any(not buffer.empty() for buffer in self.buffers):
+                # More than one drain worth queued up: let the other coroutines run, then continue
+                wakeup.set()
+                await asyncio.sleep(0)
+
+    def _process_merged(self, batches: list):
+        """Heap-merge per-bus drains (after the frames held back so far) by timestamp and decode
+        them in that order, one same-bus run at a time."""
+        now = time.monotonic()
+        for index, batch in enumerate(batches):
+            if batch:
+                self._last_seen[index] = batch[-1].timestamp
+                self._arrived[index] = now
+        batches = [held + batch for held, batch in zip(self._held, batches)]
+
+        # Buses that delivered within REORDER_WINDOW of wall-clock time can still have older frames in flight
+        active = [t for t, arrived in zip(self._last_seen, self._arrived)
+                  if t is not None and now - arrived < REORDER_WINDOW]
+        if active:
+            newest = max(active)
+            watermark = min(t for t in active if t >= newest - REORDER_WINDOW)
+        else:
+            watermark = float("inf")
+
+        for index, batch in enumerate(batches):
+            cut = len(batch)
+            while cut and batch[cut - 1].timestamp > watermark:
+                cut -= 1
+            batches[index], self._held[index] = batch[:cut], batch[cut:]
+
+        streams = [zip(itertools.repeat(index), batch) for index, batch in enumerate(batches) if batch]
+        run, run_bus = [], None
+        for index, msg in heapq.merge(*streams, key=lambda item: item[1].timestamp):
+            if index != run_bus and run:
+                self.pipeline.process(run, derive=False, bus=run_bus)
+                run = []
+            run_bus = index
+            run.append(msg)
+        if run:
+            self.pipeline.process(run, derive=False, bus=run_bus)
+
+    def _release_held(self):
+        # Held frames otherwise wait for the next drain, which needs a new frame
+        if any(self._held):
+            self._process_merged([[] for _ in self.buffers])
+
+    async def _every(self, interval: float, callback):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in periodic ingest task {callback.__name__}: {e}")
+
+    def _derive(self):
+        # Only when new frames were decoded, so the derived history has no duplicate timestamps
+        if self.pipeline.last_time != self._derived_time:
+            self._derived_time = self.pipeline.last_time
+            self.pipeline.update_derived()
+
+    def _flush_logs(self):
+        for _, log_file, _ in self._buses.values():
+            log_file.flush()
+        self.pipeline.store.persist()
+
+    def _update_rates(self):
+        received, now = sum(buffer.received for buffer in self.buffers), time.monotonic()
+        last_received, last_time = self._rate_mark
+        self.rx_rate = (received - last_received) / (now - last_time)
+        self._rate_mark = (received, now)
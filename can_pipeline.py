@@ -0,0 +1,524 @@
+import collections
+import datetime
+import heapq
+import operator
+import threading
+import time
+from pathlib import Path
+
+import can
+from cantools.database.can import Database
+
+from fast_decoder import FastDecoder
+from signal_store import SignalStore
+from pack_state import PackState
+
+
+# Drained frames above which the NumPy batch decoder beats the per-frame path
+BATCH_DECODE_MIN = 2000
+
+# Upper bound on frames decoded per worker pass, keeps snapshots flowing during a flood
+MAX_DRAIN = 20000
+
+# Seconds between writes of new samples to the session history (SignalStore.persist)
+PERSIST_INTERVAL = 1.0
+
+# Snapshot key under which derived values (pack SoC, ...) are handed to the GUI
+DERIVED_KEY = "derived"
+
+# Snapshot key under which signals cleared by request_clear() are reported (values None)
+CLEARED_KEY = "cleared"
+
+# Snapshot key under which samples handed in with post_samples() are reported
+POSTED_KEY = "posted"
+
+# What IngestBuffer does with a frame that arrives while it is full
+#   drop_oldest    evict the oldest buffered frame (display stays current, history gets a gap)
+#   drop_newest    refuse the new frame (history stays contiguous up to the stall)
+#   latest_per_id  keep only the newest frame per arbitration ID until the worker catches up
+#   drop_display   shed display-only frames (IDs with no stored signal, they only feed the
+#                  "Other CAN Data" pane) before any frame that goes into the history
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "latest_per_id", "drop_display")
+
+STANDARD_ID_MASK = 0x7FF
+EXTENDED_ID_MASK = 0x1FFFFFFF
+
+
+class IngestBuffer:
+    """Bounded frame buffer between the python-can Notifier and the DecodeWorker.
+
+    put() never blocks: the Notifier thread also feeds the log writer, which must
+    never wait on the GUI side. Overflow is handled by the policy and counted.
+    Frames held aside by latest_per_id and drop_display count towards maxsize too.
+
+    With accept_ids set, frames with other IDs are counted in filtered and
+    dropped before they take the lock. This is the pre-filter for adapters that
+    can't filter themselves (see open_logged_bus).
+
+    drop_display needs history_ids, the frame IDs that carry stored signals
+    (FastDecoder.history_ids). Other frames only update the log pane, which shows
+    the newest frame per ID, so they are always coalesced to that. When the buffer
+    is full, a stored frame evicts the oldest display-only frame first and only
+    then the oldest stored frame. Without history_ids it behaves like drop_oldest.
+
+    get_batch() returns frames in timestamp order.
+    """
+    def __init__(self, maxsize: int = 50000, policy: str = "drop_oldest", accept_ids: set | None = None,
+                 history_ids: set | None = None):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{policy}', expected one of {OVERFLOW_POLICIES}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.accept_ids = accept_ids
+        self.history_ids = history_ids
+
+        self._frames = collections.deque()
+        # latest_per_id: newest frame per ID that didn't fit; drop_display: newest display-only frame per ID
+        self._overflow = {}
+        self._cond = threading.Condition()
+
+        self.received = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.high_water = 0
+        self.filtered = 0
+
+    def put(self, msg: can.Message):
+        if self.accept_ids is not None and msg.arbitration_id not in self.accept_ids:
+            self.filtered += 1
+            return
+
+        with self._cond:
+            self.received += 1
+            frames, overflow = self._frames, self._overflow
+            frame_id = msg.arbitration_id
+            full = len(frames) + len(overflow) >= self.maxsize
+
+            if self.policy == "drop_display" and self.history_ids is not None and frame_id not in self.history_ids:
+                if frame_id in overflow:
+                    # Moved to the end, so the first entry is always the stalest one
+                    del overflow[frame_id]
+                    overflow[frame_id] = msg
+                    self.coalesced += 1
+                elif not full:
+                    overflow[frame_id] = msg
+                else:
+                    self.dropped += 1
+                    return
+            # latest_per_id: once overflowing, keep going through _overflow until drained so frames stay in order
+            elif not full and not (self.policy == "latest_per_id" and overflow):
+                frames.append(msg)
+            elif self.policy == "drop_oldest":
+                frames.popleft()
+                frames.append(msg)
+                self.dropped += 1
+            elif self.policy == "drop_display":
+                if overflow:
+                    del overflow[next(iter(overflow))]
+                else:
+                    frames.popleft()
+                frames.append(msg)
+                self.dropped += 1
+            elif self.policy == "drop_newest":
+                self.dropped += 1
+                return
+            elif frame_id in overflow:
+                overflow[frame_id] = msg
+                self.coalesced += 1
+            elif not full:
+                overflow[frame_id] = msg
+            elif frames:
+                # Stay within maxsize: the oldest queued frame makes room
+                frames.popleft()
+                overflow[frame_id] = msg
+                self.dropped += 1
+            else:
+                self.dropped += 1
+                return
+
+            depth = len(frames) + len(overflow)
+            if depth > self.high_water:
+                self.high_water = depth
+            self._cond.notify()
+
+    def get_batch(self, max_items: int, timeout: float) -> list:
+        """Take up to max_items queued frames plus the ones set aside, in timestamp order,
+        waiting up to timeout for the first one."""
+        with self._cond:
+            frames = self._frames
+            if not frames and not self._overflow:
+                self._cond.wait(timeout)
+
+            batch = [frames.popleft() for _ in range(min(max_items, len(frames)))]
+            if not self._overflow:
+                return batch
+            if not frames:
+                aside, self._overflow = list(self._overflow.values()), {}
+            elif self.policy == "drop_display" and batch:
+                # More queued: release only display-only frames that don't overtake them
+                cutoff = batch[-1].timestamp
+                aside = [msg for msg in self._overflow.values() if msg.timestamp <= cutoff]
+                for msg in aside:
+                    del self._overflow[msg.arbitration_id]
+            else:
+                return batch
+
+        aside.sort(key=operator.attrgetter("timestamp"))
+        if not batch:
+            return aside
+        return list(heapq.merge(batch, aside, key=operator.attrgetter("timestamp")))
+
+    def qsize(self) -> int:
+        return len(self._frames) + len(self._overflow)
+
+    def empty(self) -> bool:
+        return not self.qsize()
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "depth": self.qsize(),
+            "high_water": self.high_water,
+            "capacity": self.maxsize,
+            "filtered": self.filtered,
+        }
+
+
+class CANListener(can.Listener):
+    """A can.Listener that puts received messages into an IngestBuffer."""
+    def __init__(self, msg_queue: IngestBuffer):
+        self.queue = msg_queue
+
+    def on_message_received(self, msg: can.Message):
+        self.queue.put(msg)
+
+    def on_error(self, exc: Exception):
+        print(f"An error occurred in the CAN listener: {exc}")
+
+
+class BusConfig:
+    """One CAN bus to capture: the adapter, its bitrate and the DBC that decodes it.
+
+    dbc_filter only accepts the DBC's frame IDs plus allow_ids, see dbc_can_filters().
+    record_all decodes every signal of the DBC into the history; without it only
+    the signals a widget, the plot or SoC subscribed to are decoded and stored.
+    """
+    def __init__(self, name: str, channel: str, bitrate: int, dbc_path: str, interface: str = "slcan",
+                 dbc_filter: bool = False, allow_ids: tuple = (), record_all: bool = True):
+        self.name = name
+        self.channel = channel
+        self.bitrate = bitrate
+        self.dbc_path = dbc_path
+        self.interface = interface
+        self.dbc_filter = dbc_filter
+        self.allow_ids = allow_ids
+        self.record_all = record_all
+
+
+def dbc_can_filters(db: Database, allow_ids=()) -> list[dict]:
+    """python-can receive filters matching exactly the DBC's frame IDs plus allow_ids."""
+    filters = [{"can_id": msg.frame_id, "extended": msg.is_extended_frame,
+                "can_mask": EXTENDED_ID_MASK if msg.is_extended_frame else STANDARD_ID_MASK}
+               for msg in db.messages]
+    for can_id in allow_ids:
+        extended = can_id > STANDARD_ID_MASK
+        filters.append({"can_id": can_id, "extended": extended,
+                        "can_mask": EXTENDED_ID_MASK if extended else STANDARD_ID_MASK})
+    return filters
+
+
+def filter_ids(can_filters: list | None) -> set | None:
+    """The IngestBuffer accept set for can_filters, None when not filtering."""
+    return {f["can_id"] for f in can_filters} if can_filters else None
+
+
+def open_logged_bus(usb_can_path: str, bitrate: int, interface: str = "slcan", name: str | None = None,
+                    can_filters: list | None = None):
+    """Open the bus and a fresh timestamped log file, returns (bus, log_file, log_writer).
+
+    name is appended to the log file name, so every bus of a session gets its own log.
+
+    can_filters are kept where the interface installs them all, which in practice
+    means socketcan (in the kernel); the log file then only has the accepted frames
+    too. Adapters with a single hardware filter (kvaser, or vector with one per ID
+    type) can't hold one exact match per DBC frame and fall back to software. In
+    that case the filters are removed again: python-can would match every frame
+    against every filter in recv(), and the IngestBuffer accept set does the same
+    job with one set lookup.
+    """
+    bus = can.Bus(interface=interface, channel=usb_can_path, bitrate=bitrate, can_filters=can_filters)
+    # _is_filtered is a python-can internal: set by backends whose _apply_filters() took the filters
+    if can_filters and not getattr(bus, "_is_filtered", False):
+        bus.set_filters(None)
+
+    suffix = f"_{name}" if name else ""
+    log_filename = f"can_log_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}{suffix}.log"
+    log_file_path = Path("logs") / log_filename
+    log_file_path.parent.mkdir(parents=True, exist_ok=True)
+    log_file = open(log_file_path, "a", encoding='utf-8', newline='')
+    log_writer = can.CanutilsLogWriter(log_file)
+
+    return bus, log_file, log_writer
+
+
+class DecodePipeline:
+    """Decodes frames into the signal store and keeps the display snapshot for the GUI.
+
+    Every decoded sample is appended to the store; the GUI only collects what
+    changed since its last frame with take_snapshot(). The display path is
+    coalesced per arbitration ID: only the newest frame of each displayed ID is
+    kept until the GUI takes it, older ones are counted in coalesced_frames
+    (they are still in the store and the log file).
+
+    Cell signals are also written into the dense PackState, if one is given.
+
+    The decoders and the pack state must be built with the store's ids table:
+    decoded frames, the display snapshot and derived values are all keyed by
+    signal ID. displayed_signals and derived are given by name and interned here.
+
+    Frames from further buses are decoded with the decoder registered by add_bus();
+    all buses share one time origin so their histories line up. Their display
+    and log pane keys are (bus, arbitration id) so equal IDs on different buses
+    don't collide.
+
+    The thread driving it is the store's only writer. Other threads clear a signal
+    with request_clear() and add samples (the demo) with post_samples(); that
+    thread carries both out in apply_requests().
+
+    Not a thread itself; DecodeWorker and AsyncIngest drive it.
+    """
+    def __init__(self, decoder: FastDecoder, store: SignalStore, displayed_signals: set,
+                 derived: dict | None = None, pack: PackState | None = None):
+        self.decoders = [decoder]
+        self.bus_labels = [""]
+        self.store = store
+        self.pack = pack
+        ids = store.ids
+        self.displayed_ids = {ids[name] for name in displayed_signals if name in ids}
+        # signal ID -> callable returning the value or None
+        self.derived = {ids[name]: compute for name, compute in (derived or {}).items()}
+        self.start_timestamp = 0
+        self.last_time = 0.0             # relative time of the newest frame processed
+        self.coalesced_frames = 0
+
+        self._lock = threading.Lock()
+        self._frames = {}                # arbitration id -> {signal ID: value} of its newest frame
+        self._other = {}                 # can id -> (timestamp, log line) or (bus, frame) for the "Other CAN Data" pane
+        self._clears = set()             # signal IDs to clear, see request_clear()
+        self._posted = []                # (relative time, {signal ID: value}), see post_samples()
+
+    def take_snapshot(self) -> tuple[dict, dict]:
+        """Return ({arbitration id: {signal ID: value}}, {can_id: (timestamp, log line)}) since the previous call.
+
+        Derived values are under DERIVED_KEY instead of an arbitration ID.
+        """
+        with self._lock:
+            frames, self._frames = self._frames, {}
+            other, self._other = self._other, {}
+
+        for key, (bus, msg) in other.items():
+            if isinstance(msg, can.Message):
+                other[key] = (msg.timestamp, self.describe(bus, msg))
+        return frames, other
+
+    def add_bus(self, decoder: FastDecoder, name: str) -> int:
+        """Register the decoder of another bus, returns the bus index for process()."""
+        self.decoders.append(decoder)
+        self.bus_labels.append(f"[{name}] ")
+        return len(self.decoders) - 1
+
+    def post_status(self, text: str, can_id: int = 0x00):
+        """Show a status line (connection state, errors) in the log pane."""
+        with self._lock:
+            self._other[can_id] = (time.time(), text)
+
+    def process(self, frames: list, derive: bool = True, bus: int = 0):
+        """Decode time-ordered frames that all came from one bus."""
+        if self.start_timestamp == 0:
+            self.start_timestamp = frames[0].timestamp
+        self.last_time = max(self.last_time, frames[-1].timestamp - self.start_timestamp)
+
+        display = {}
+        other = {}
+
+        if len(frames) >= BATCH_DECODE_MIN:
+            frames = self._process_batch(frames, display, other, bus)
+
+        for msg in frames:
+            self._process_frame(msg, display, other, bus)
+
+        with self._lock:
+            self.coalesced_frames += sum(1 for key in display if key in self._frames)
+            self._frames.update(display)
+            self._other.update(other)
+
+        # Derived values once per pass (avoids recalcing 1000x per frame)
+        if derive:
+            self.update_derived()
+
+    def request_clear(self, sid: int):
+        """Clear a signal's history from any thread, done by the writer in apply_requests()."""
+        with self._lock:
+            self._clears.add(sid)
+
+    def post_samples(self, t: float, values: dict):
+        """Add samples taken at relative time t from any thread, appended by the writer in apply_requests()."""
+        with self._lock:
+            self._posted.append((t, values))
+
+    def apply_requests(self, derive: bool = True):
+        """On the writer thread: clear the requested signals and append the posted samples.
+
+        They are reported under CLEARED_KEY and POSTED_KEY. Posted samples move
+        last_time and, with derive, update the derived values.
+        """
+        if not self._clears and not self._posted:
+            return
+        with self._lock:
+            clears, self._clears = self._clears, set()
+            posted, self._posted = self._posted, []
+
+        for sid in clears:
+            self.store.clear(sid)
+        shown = {}
+        append = self.store.append
+        for t, values in posted:
+            for sid, value in values.items():
+                append(sid, t, value)
+            if self.pack is not None:
+                self.pack.update(values)
+            shown.update(values)
+            self.last_time = max(self.last_time, t)
+
+        with self._lock:
+            if clears:
+                self._frames.setdefault(CLEARED_KEY, {}).update(dict.fromkeys(clears))
+            if shown:
+                self._frames.setdefault(POSTED_KEY, {}).update(shown)
+        if posted and derive:
+            self.update_derived()
+
+    def update_derived(self):
+        derived = {}
+        for sid, compute in self.derived.items():
+            value = compute()
+            if value is not None:
+                self.store.append(sid, self.last_time, value)
+                derived[sid] = value
+
+        if derived:
+            with self._lock:
+                self._frames.setdefault(DERIVED_KEY, {}).update(derived)
+
+    def describe(self, bus: int, msg: can.Message) -> str:
+        """Log pane line for a frame, with every signal decoded."""
+        decoder = self.decoders[bus]
+        label = self.bus_labels[bus]
+        try:
+            return f"{label}{decoder.message_name(msg.arbitration_id)} {decoder.decode_all(msg.arbitration_id, msg.data)}"
+        except KeyError:
+            return f"{label}Unknown ID. Data: {' '.join(f'{b:02X}' for b in msg.data)}"
+        except Exception as e:
+            return f"{label}Error decoding message: {e}"
+
+    def _process_frame(self, msg: can.Message, display: dict, other: dict, bus: int):
+        relative_time = msg.timestamp - self.start_timestamp
+        key = (bus, msg.arbitration_id) if bus else msg.arbitration_id
+
+        try:
+            # Only the subscribed signals; frames nobody subscribed to decode to {}
+            decoded = self.decoders[bus].decode(msg.arbitration_id, msg.data)
+
+            if not self.displayed_ids.isdisjoint(decoded):
+                if key in display:
+                    self.coalesced_frames += 1
+                display[key] = decoded
+            else:
+                # Formatted by take_snapshot(), only for the newest frame of each ID
+                other[key] = (bus, msg)
+
+            append = self.store.append
+            for sid, value in decoded.items():
+                append(sid, relative_time, value)
+            if self.pack is not None:
+                self.pack.update(decoded)
+
+        except KeyError:
+            other[key] = (bus, msg)
+
+        except Exception as e:
+            print(f"Error decoding or processing message: {e}")
+
+    def _process_batch(self, frames: list, display: dict, other: dict, bus: int) -> list:
+        """Decode a large drain in one vectorized pass, returns the frames left for _process_frame."""
+        groups, rest = self.decoders[bus].decode_batch(frames)
+        newest = None                   # arbitration id -> newest frame, for the log pane
+
+        for frame_id, (timestamps, columns) in groups.items():
+            times = timestamps - self.start_timestamp
+            latest = {sid: values[-1].item() for sid, values in columns.items()}
+            key = (bus, frame_id) if bus else frame_id
+
+            if not self.displayed_ids.isdisjoint(columns):
+                self.coalesced_frames += len(times) - 1
+                display[key] = latest
+            else:
+                if newest is None:
+                    newest = {msg.arbitration_id: msg for msg in frames}
+                other[key] = (bus, newest[frame_id])
+
+            for sid, values in columns.items():
+                self.store.extend(sid, times, values)
+            if self.pack is not None:
+                self.pack.update(latest)
+
+        return rest
+
+
+class DecodeWorker(threading.Thread):
+    """Runs a DecodePipeline on its own thread, fed from an IngestBuffer.
+
+    Sits between the python-can Notifier (via CANListener) and the GUI, so
+    decoding and storage never run on the Tk thread.
+    """
+    def __init__(self, decoder: FastDecoder, store: SignalStore, msg_queue: IngestBuffer,
+                 displayed_signals: set, derived: dict | None = None, pack: PackState | None = None):
+        super().__init__(name="can-decode", daemon=True)
+        self.queue = msg_queue
+        self.pipeline = DecodePipeline(decoder, store, displayed_signals, derived, pack)
+        self._stop_event = threading.Event()
+
+    def stop(self, timeout: float = 1.0):
+        self._stop_event.set()
+        self.join(timeout)
+
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    def stats(self) -> dict:
+        """Buffer counters plus frames coalesced on the display path."""
+        return dict(self.queue.stats(), display_coalesced=self.pipeline.coalesced_frames)
+
+    def take_snapshot(self) -> tuple[dict, dict]:
+        return self.pipeline.take_snapshot()
+
+    def clear(self, sid: int):
+        """Clear a signal's history on the worker thread, within 0.1 s."""
+        self.pipeline.request_clear(sid)
+
+    def post_samples(self, t: float, values: dict):
+        """Append {signal ID: value} at relative time t on the worker thread, within 0.1 s."""
+        self.pipeline.post_samples(t, values)
+
+    def run(self):
+        persisted = time.monotonic()
+        while not self._stop_event.is_set():
+            self.pipeline.apply_requests()
+            frames = self.queue.get_batch(MAX_DRAIN, timeout=0.1)
+            if frames:
+                self.pipeline.process(frames)
+            if time.monotonic() - persisted >= PERSIST_INTERVAL:
+                persisted = time.monotonic()
+                self.pipeline.store.persist()
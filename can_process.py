@@ -0,0 +1,343 @@
+import multiprocessing as mp
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import can
+
+from fast_decoder import FastDecoder
+from signal_store import SignalStore
+from pack_state import PackState
+from can_pipeline import CLEARED_KEY, DERIVED_KEY, PERSIST_INTERVAL, POSTED_KEY, CANListener, DecodeWorker, IngestBuffer, filter_ids, open_logged_bus
+
+
+# Ingest counters published by the child process, in SharedSignalTable.stats order
+STAT_FIELDS = ("received", "dropped", "coalesced", "depth", "high_water", "capacity", "display_coalesced", "filtered")
+_STATS_SLOTS = 8
+
+# Seconds between pulls of new samples from the shared table into the GUI's SignalStore
+PULL_INTERVAL = 0.02
+
+
+class SharedSignalTable:
+    """Latest value and ring-buffered history of every signal, in one shared memory block.
+
+    Layout (all 8 byte columns, signal index = position in signal_names, also its ID in ids):
+        stats[8]               ingest counters, see STAT_FIELDS
+        counts[n]              samples ever written per signal (ring index = count % capacity)
+        latest[n]              last value written
+        times[n, capacity]     ring of relative timestamps
+        values[n, capacity]    ring of values
+
+    There is a single writer (the ingest process). It fills the ring slot before
+    bumping counts, so a reader that copies counts first never sees a half-written sample.
+    The writer side has SignalStore's append()/extend()/persist() so DecodeWorker can write into it.
+    """
+    def __init__(self, signal_names: list, capacity: int, shm: shared_memory.SharedMemory):
+        self.signal_names = signal_names
+        self.ids = {name: i for i, name in enumerate(signal_names)}
+        self.capacity = capacity
+        self.shm = shm
+
+        n = len(signal_names)
+        buf = shm.buf
+        offset = _STATS_SLOTS * 8
+        self.stats = np.ndarray((_STATS_SLOTS,), dtype=np.int64, buffer=buf, offset=0)
+        self.counts = np.ndarray((n,), dtype=np.int64, buffer=buf, offset=offset)
+        self.latest = np.ndarray((n,), dtype=np.float64, buffer=buf, offset=offset + n * 8)
+        self.times = np.ndarray((n, capacity), dtype=np.float64, buffer=buf, offset=offset + n * 16)
+        self.values = np.ndarray((n, capacity), dtype=np.float64, buffer=buf, offset=offset + n * 16 + n * capacity * 8)
+
+    @staticmethod
+    def size_for(num_signals: int, capacity: int) -> int:
+        return _STATS_SLOTS * 8 + num_signals * 16 + num_signals * capacity * 16
+
+    @classmethod
+    def create(cls, signal_names: list, capacity: int) -> "SharedSignalTable":
+        shm = shared_memory.SharedMemory(create=True, size=cls.size_for(len(signal_names), capacity))
+        table = cls(signal_names, capacity, shm)
+        table.stats[:] = 0
+        table.counts[:] = 0
+        return table
+
+    def publish_stats(self, stats: dict):
+        self.stats[:len(STAT_FIELDS)] = [stats.get(field, 0) for field in STAT_FIELDS]
+
+    def read_stats(self) -> dict:
+        return dict(zip(STAT_FIELDS, self.stats[:len(STAT_FIELDS)].tolist()))
+
+    @classmethod
+    def attach(cls, name: str, signal_names: list, capacity: int) -> "SharedSignalTable":
+        # Child processes share the creator's resource tracker, so only the creator unlinks
+        return cls(signal_names, capacity, shared_memory.SharedMemory(name=name))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.ids
+
+    def append(self, idx: int, t: float, value: float):
+        count = self.counts[idx]
+        slot = count % self.capacity
+        self.times[idx, slot] = t
+        self.values[idx, slot] = value
+        self.latest[idx] = value
+        self.counts[idx] = count + 1
+
+    def extend(self, idx: int, times: np.ndarray, values: np.ndarray):
+        count = int(self.counts[idx])
+        n = len(times)
+        # Only the newest capacity samples survive anyway
+        keep = min(n, self.capacity)
+        slots = np.arange(count + n - keep, count + n) % self.capacity
+        self.times[idx, slots] = times[n - keep:]
+        self.values[idx, slots] = values[n - keep:]
+        self.latest[idx] = values[-1]
+        self.counts[idx] = count + n
+
+    def persist(self):
+        # History is persisted from the parent's SignalStore, see ProcessIngest
+        pass
+
+    def read(self, idx: int, start: int, end: int) -> tuple[np.ndarray, np.ndarray]:
+        """Copy samples [start, end) of one signal, clipped to what is still in the ring."""
+        start = max(start, end - self.capacity)
+        slots = np.arange(start, end) % self.capacity
+        return self.times[idx, slots], self.values[idx, slots]
+
+    def close(self):
+        # Drop the numpy views first, SharedMemory refuses to close with exported buffers
+        self.stats = self.counts = self.latest = self.times = self.values = None
+        self.shm.close()
+
+
+def _ingest_main(shm_name, signal_names, capacity, dbc_path, usb_can_path, bitrate,
+                 displayed_signals, queue_size, overflow_policy, can_filters, subscribed,
+                 other_queue, connected, stop_event):
+    """Entry point of the ingest process: bus, log file and decoding, writing into the table."""
+    table = SharedSignalTable.attach(shm_name, signal_names, capacity)
+
+    decoder = FastDecoder.from_file(dbc_path, table.ids)
+    if subscribed is not None:
+        decoder.subscribe("gui", subscribed)
+
+    msg_queue = IngestBuffer(queue_size, overflow_policy, filter_ids(can_filters), decoder.history_ids)
+    worker = DecodeWorker(decoder, table, msg_queue, displayed_signals)
+    worker.start()
+
+    try:
+        bus, log_file, log_writer = open_logged_bus(usb_can_path, bitrate, can_filters=can_filters)
+    except Exception as e:
+        other_queue.put((0x00, (time.time(), f"Error initializing CAN: {e}")))
+        worker.stop()
+        table.close()
+        return
+
+    notifier = can.Notifier(bus, [CANListener(msg_queue), log_writer])
+    connected.set()
+    other_queue.put((0x00, (time.time(), "Successfully connected to CAN bus.")))
+
+    try:
+        while not stop_event.wait(0.1):
+            table.publish_stats(worker.stats())
+            _, other = worker.take_snapshot()
+            for item in other.items():
+                try:
+                    other_queue.put_nowait(item)
+                except queue.Full:
+                    break  # GUI is not reading, the log pane can miss a refresh
+    finally:
+        notifier.stop()
+        bus.shutdown()
+        log_file.close()
+        worker.stop()
+        table.close()
+
+
+class ProcessIngest:
+    """Runs bus reading, logging and decoding in a separate process.
+
+    The GUI side has the same start()/stop()/take_snapshot() interface as DecodeWorker.
+    A sync thread in the GUI process copies the samples written since its previous
+    pull from the shared table into the local SignalStore, computes the derived values
+    and persists the session history. It is the store's one writer, so the Tk thread's
+    take_snapshot() only swaps out the display values gathered since the last call.
+    signal_frames maps every DBC signal to its arbitration ID, for the per-ID display
+    snapshot. subscribed is the signal set the child decodes, fixed for the session.
+
+    The table has its own signal indexes; they are mapped to store IDs once here,
+    so snapshots are keyed by store ID like DecodePipeline's.
+    """
+    def __init__(self, dbc_path: str, usb_can_path: str, bitrate: int, store: SignalStore,
+                 signal_frames: dict, displayed_signals: set, derived: dict | None = None,
+                 capacity: int = 4096, queue_size: int = 50000, overflow_policy: str = "drop_oldest",
+                 can_filters: list | None = None, subscribed: set | None = None, pack: PackState | None = None):
+        self.store = store
+        self.pack = pack
+        self.coalesced_frames = 0
+
+        ids = store.ids
+        signal_names = list(signal_frames)
+        self.derived = {ids[name]: compute for name, compute in (derived or {}).items()}
+        # Per table index: store ID, and arbitration ID if the signal is displayed (else None)
+        self._store_ids = [ids[name] for name in signal_names]
+        self._display_frames = [signal_frames[name] if name in displayed_signals else None for name in signal_names]
+
+        self.table = SharedSignalTable.create(signal_names, capacity)
+        self._seen = np.zeros(len(signal_names), dtype=np.int64)
+        self._last_time = 0.0
+        self._lock = threading.Lock()
+        self._frames = {}               # arbitration id -> {signal ID: value} pulled since the last snapshot
+        self._clears = set()            # signal IDs to clear on the sync thread, see clear()
+        self._posted = []               # (relative time, {signal ID: value}), see post_samples()
+        self._sync = threading.Thread(target=self._sync_main, name="can-process-sync", daemon=True)
+
+        # spawn, not fork: the parent is running Tk, which must not be forked
+        ctx = mp.get_context("spawn")
+        self.connected = ctx.Event()
+        self._stop_event = ctx.Event()
+        self._other_queue = ctx.Queue(maxsize=1000)
+        self.process = ctx.Process(
+            target=_ingest_main,
+            name="can-ingest",
+            args=(self.table.shm.name, signal_names, capacity, dbc_path, usb_can_path, bitrate,
+                  set(displayed_signals), queue_size, overflow_policy, can_filters, subscribed,
+                  self._other_queue, self.connected, self._stop_event),
+            daemon=True,
+        )
+
+    def start(self):
+        self.process.start()
+        self._sync.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop_event.set()
+        if self._sync.is_alive():
+            self._sync.join(timeout)
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.table.close()
+        self.table.shm.unlink()
+
+    def queue_depth(self) -> int:
+        """Samples written by the ingest process that the GUI has not pulled yet."""
+        return int(self.table.counts.sum() - self._seen.sum())
+
+    def stats(self) -> dict:
+        """Counters of the child's IngestBuffer, plus display coalescing on both sides."""
+        stats = self.table.read_stats()
+        stats["display_coalesced"] += self.coalesced_frames
+        return stats
+
+    def take_snapshot(self) -> tuple[dict, dict]:
+        """Return ({arbitration id: {signal ID: value}}, {can_id: (timestamp, log line)}) since the previous call."""
+        with self._lock:
+            frames, self._frames = self._frames, {}
+
+        other = {}
+        while True:
+            try:
+                can_id, log_content = self._other_queue.get_nowait()
+            except queue.Empty:
+                break
+            other[can_id] = log_content
+        return frames, other
+
+    def clear(self, sid: int):
+        """Clear a signal's history on the sync thread, the store's writer."""
+        with self._lock:
+            self._clears.add(sid)
+
+    def post_samples(self, t: float, values: dict):
+        """Append {signal ID: value} at relative time t on the sync thread."""
+        with self._lock:
+            self._posted.append((t, values))
+
+    def _sync_main(self):
+        persisted = time.monotonic()
+        while not self._stop_event.wait(PULL_INTERVAL):
+            try:
+                self._apply_requests()
+                self._pull()
+            except Exception as e:
+                print(f"Error pulling samples from the ingest process: {e}")
+            if time.monotonic() - persisted >= PERSIST_INTERVAL:
+                persisted = time.monotonic()
+                self.store.persist()
+        self._pull()
+
+    def _apply_requests(self):
+        if not self._clears and not self._posted:
+            return
+        with self._lock:
+            clears, self._clears = self._clears, set()
+            posted, self._posted = self._posted, []
+
+        for sid in clears:
+            self.store.clear(sid)
+        shown = {}
+        for t, values in posted:
+            for sid, value in values.items():
+                self.store.append(sid, t, value)
+            if self.pack is not None:
+                self.pack.update(values)
+            shown.update(values)
+            self._last_time = max(self._last_time, t)
+        derived = self._update_derived() if posted else {}
+
+        with self._lock:
+            if clears:
+                self._frames.setdefault(CLEARED_KEY, {}).update(dict.fromkeys(clears))
+            if shown:
+                self._frames.setdefault(POSTED_KEY, {}).update(shown)
+            if derived:
+                self._frames.setdefault(DERIVED_KEY, {}).update(derived)
+
+    def _update_derived(self) -> dict:
+        """Append the derived values at the newest sample time, returns {signal ID: value}."""
+        derived = {}
+        for sid, compute in self.derived.items():
+            value = compute()
+            if value is not None:
+                self.store.append(sid, self._last_time, value)
+                derived[sid] = value
+        return derived
+
+    def _pull(self):
+        """Copy new samples from the table into the store and queue their display values."""
+        frames = {}
+        new_samples = {}                # arbitration id -> most samples any of its signals got
+        counts = self.table.counts.copy()
+        updated = np.flatnonzero(counts != self._seen).tolist()
+
+        for idx in updated:
+            sid = self._store_ids[idx]
+            times, values = self.table.read(idx, int(self._seen[idx]), int(counts[idx]))
+            self.store.extend(sid, times, values)
+            self._last_time = max(self._last_time, times[-1].item())
+            if self.pack is not None:
+                self.pack.set(sid, values[-1])
+
+            frame_id = self._display_frames[idx]
+            if frame_id is not None:
+                frames.setdefault(frame_id, {})[sid] = values[-1].item()
+                new_samples[frame_id] = max(new_samples.get(frame_id, 0), int(counts[idx] - self._seen[idx]))
+        self._seen = counts
+
+        if updated:
+            derived = self._update_derived()
+            if derived:
+                frames[DERIVED_KEY] = derived
+
+        with self._lock:
+            pending = self._frames
+            # Older frames of the same ID were only written to the history
+            coalesced = sum(n - 1 for n in new_samples.values())
+            for frame_id, signals in frames.items():
+                if frame_id in pending:
+                    pending[frame_id].update(signals)
+                    coalesced += frame_id not in (DERIVED_KEY, CLEARED_KEY)
+                else:
+                    pending[frame_id] = signals
+            self.coalesced_frames += coalesced
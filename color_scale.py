@@ -0,0 +1,56 @@
+import numpy as np
+
+
+# Palette entries per scale; at 256 steps neighbouring colours differ by at most one unit per channel
+DEFAULT_STEPS = 256
+
+# Colour shown for values not received yet
+MISSING_COLOR = "#808080"
+
+# Tile colour scales: name -> (value at start colour, value at end colour, start colour, end colour)
+DEFAULT_SCALES = {
+    "cell_voltage": (3.0, 4.2, "#FF0000", "#00FF00"),
+    "segment_voltage": (48.0, 67.2, "#FF0000", "#00FF00"),
+    "temperature": (10.0, 100.0, "#00FF00", "#FF0000"),
+    "imbalance": (0.0, 500.0, "#00FF00", "#FF0000"),     # |VoltageDiff| in mV
+}
+
+
+class ColorScale:
+    """Linear colour ramp between two hex colours over [lo, hi], precomputed as a palette.
+
+    Mapping a value is one multiply, a clamp and a list index, instead of parsing and
+    formatting hex strings per call. Values outside the range get the end colours.
+    map() does the same for a whole array, e.g. every cell of the pack at once.
+    """
+    def __init__(self, lo: float, hi: float, start_hex: str, end_hex: str, steps: int = DEFAULT_STEPS):
+        self.lo = lo
+        self.hi = hi
+        start = np.array([int(start_hex[i:i + 2], 16) for i in (1, 3, 5)])
+        end = np.array([int(end_hex[i:i + 2], 16) for i in (1, 3, 5)])
+        rgb = (start + np.linspace(0.0, 1.0, steps)[:, None] * (end - start)).astype(int)
+        self.colors = [f"#{r:02x}{g:02x}{b:02x}" for r, g, b in rgb.tolist()]
+        self._palette = np.array(self.colors + [MISSING_COLOR])
+        self._last = steps - 1
+        self._scale = self._last / (hi - lo)
+
+    def __call__(self, value: float) -> str:
+        i = int((value - self.lo) * self._scale + 0.5)
+        if i < 0:
+            i = 0
+        elif i > self._last:
+            i = self._last
+        return self.colors[i]
+
+    def map(self, values: np.ndarray) -> np.ndarray:
+        """Colours of an array of values (same shape), MISSING_COLOR where NaN."""
+        values = np.asarray(values, dtype=np.float64)
+        index = np.clip(np.rint((values - self.lo) * self._scale), 0, self._last)
+        index[np.isnan(values)] = self._last + 1
+        return self._palette[index.astype(np.intp)]
+
+
+def build_scales(overrides: dict | None = None, steps: int = DEFAULT_STEPS) -> dict:
+    """ColorScales for DEFAULT_SCALES, with entries of overrides (same tuple format) replacing or adding to them."""
+    specs = dict(DEFAULT_SCALES, **(overrides or {}))
+    return {name: ColorScale(*spec, steps=steps) for name, spec in specs.items()}
@@ -6,11 +6,11 @@ from pathlib import Path
 
 
 
-def add_bms_cell_messages(db: Database, base_id):
-    """Generates a list of similar messages with unique IDs and uniquely named signals."""
-    
-    num_cells = 16
-    num_segments = 7
+def add_bms_cell_messages(db: Database, base_id, num_segments: int = 7, num_cells: int = 16):
+    """Generates a list of similar messages with unique IDs and uniquely named signals.
+
+    num_segments x num_cells is the pack topology; the GUI reads it back from the signal names.
+    """
 
     # int16 range = -32,768 to 32,767
     voltage_conversion = LinearConversion(0.001, 0, False)
@@ -54,7 +54,7 @@ def add_bms_cell_messages(db: Database, base_id):
 
         message = Message(
             name                = f"SEG_{seg}_MSG", 
-            frame_id            = base_id + (7*num_cells) + (seg-1),
+            frame_id            = base_id + (num_segments*num_cells) + (seg-1),
             signals             = signals,
             length              = 8, 
             is_extended_frame   = True,
@@ -203,6 +203,10 @@ add_inverter_dbc(dbc, "./hv500_can2_map_v24_EID_custom.dbc")
 # 0x00XX14 (XX -> 0x00 to 0x24) for the inverter
 cell_base_id = 0xB000
 
+# Pack topology, e.g. 10 segments x 20 cells for the larger pack
+num_segments = 7
+num_cells = 16
+
 
-add_bms_cell_messages(db=dbc, base_id=cell_base_id)
+add_bms_cell_messages(db=dbc, base_id=cell_base_id, num_segments=num_segments, num_cells=num_cells)
 save_dbc(dbc, 'bms_can_database.dbc')
@@ -0,0 +1,77 @@
+import random
+import timeit
+
+import cantools
+from cantools.database.can import Database
+
+from fast_decoder import FastDecoder
+
+
+# Microbenchmark: cantools decode_message vs FastDecoder on the BMS frame layouts
+
+db_filepath = "databases/bms_can_database.dbc"
+num_frames = 20000
+repeats = 5
+
+db: Database = cantools.database.load_file(db_filepath)
+decoder = FastDecoder(db)
+
+print(f"Compiled layouts: {len(decoder.layouts)}, cantools fallback: {len(decoder.fallback_ids)}")
+
+# One broadcast worth of BMS traffic: every compiled frame, random payloads
+bms_ids = list(decoder.layouts)
+frames = [(random.choice(bms_ids), random.randbytes(8)) for _ in range(num_frames)]
+
+# Both decoders must agree before timing anything
+for frame_id, data in frames:
+    expected = db.decode_message(frame_id, data)
+    actual = decoder.decode(frame_id, data)
+    assert actual == expected, (hex(frame_id), actual, expected)
+
+
+def run_cantools():
+    for frame_id, data in frames:
+        db.decode_message(frame_id, data)
+        db.get_message_by_frame_id(frame_id).name
+
+
+def run_fast():
+    for frame_id, data in frames:
+        decoder.decode(frame_id, data)
+        decoder.message_name(frame_id)
+
+
+t_cantools = min(timeit.repeat(run_cantools, number=1, repeat=repeats))
+t_fast = min(timeit.repeat(run_fast, number=1, repeat=repeats))
+
+print(f"cantools: {t_cantools / num_frames * 1e6:6.2f} us/frame")
+print(f"fast:     {t_fast / num_frames * 1e6:6.2f} us/frame")
+print(f"speedup:  {t_cantools / t_fast:6.1f}x")
+
+
+# Batch decode: cost per tick for a drained queue of n frames
+import can
+
+for batch_size in (121, 1210, 12100, 121000):
+    # Whole broadcasts, as after a bus reconnect or a fast replay
+    batch = [can.Message(arbitration_id=bms_ids[i % len(bms_ids)], data=random.randbytes(8), timestamp=i * 1e-4, is_extended_id=True)
+             for i in range(batch_size)]
+
+    groups, rest = decoder.decode_batch(batch)
+    for frame_id, (timestamps, columns) in groups.items():
+        expected = [db.decode_message(msg.arbitration_id, msg.data) for msg in batch if msg.arbitration_id == frame_id]
+        for name, values in columns.items():
+            assert values.tolist() == [d[name] for d in expected], name
+
+    t_per_frame = min(timeit.repeat(lambda: [decoder.decode(m.arbitration_id, m.data) for m in batch], number=1, repeat=repeats))
+    t_batch = min(timeit.repeat(lambda: decoder.decode_batch(batch), number=1, repeat=repeats))
+    print(f"batch of {batch_size:6d}: per-frame {t_per_frame * 1e3:8.2f} ms, vectorized {t_batch * 1e3:8.2f} ms")
+
+
+# Subscribed decode: only the cell voltages the SoC estimate reads, every other frame decodes to {}
+subscribed = {s.name for msg in db.messages for s in msg.signals if s.name.startswith("CELL_") and s.name.endswith("_Voltage")}
+decoder.subscribe("bench", subscribed)
+
+t_subscribed = min(timeit.repeat(run_fast, number=1, repeat=repeats))
+print(f"subscribed to {len(subscribed)} of {sum(len(m.signals) for m in db.messages)} signals: "
+      f"{t_subscribed / num_frames * 1e6:6.2f} us/frame ({t_fast / t_subscribed:.1f}x vs all signals)")
@@ -0,0 +1,327 @@
+import struct
+
+import numpy as np
+import cantools
+from cantools.database.can import Database, Message
+
+
+# struct codes for byte aligned little endian fields: (length, is_signed) -> code
+_INT_CODES = {
+    (8, False): "B", (8, True): "b",
+    (16, False): "H", (16, True): "h",
+    (32, False): "I", (32, True): "i",
+    (64, False): "Q", (64, True): "q",
+}
+_FLOAT_CODES = {32: "f", 64: "d"}
+
+# Matching numpy dtypes for the batch decoder
+_NUMPY_CODES = {
+    "B": "<u1", "b": "<i1", "H": "<u2", "h": "<i2",
+    "I": "<u4", "i": "<i4", "Q": "<u8", "q": "<i8",
+    "f": "<f4", "d": "<f8",
+}
+
+
+def _decode_nothing(data):
+    return {}
+
+
+class FrameLayout:
+    """A message compiled into one struct.Struct plus a per-signal scale/offset table.
+
+    decode(data) is generated from the table at compile time so the hot path is a
+    single unpack_from() and one dict literal, with no per-signal Python loop.
+
+    decode only extracts the signals picked with select() (all by default) and
+    unpacks only the slots they live in; decode_all always returns every signal.
+    With signal_ids, decode keys its result by signal ID (keys maps name -> key)
+    while decode_all stays keyed by name.
+    """
+    __slots__ = ("name", "frame_id", "length", "unpacker", "slot_codes", "slot_offsets", "signals", "keys",
+                 "active", "decode", "decode_every", "decode_all", "dtype")
+
+    def __init__(self, name: str, frame_id: int, length: int, unpacker: struct.Struct, slot_offsets: list, signals: list,
+                 signal_ids: dict | None = None):
+        self.name = name
+        self.frame_id = frame_id
+        self.length = length
+        self.unpacker = unpacker
+        self.slot_codes = [c for c in unpacker.format if c != "<" and c != "x"]
+        self.slot_offsets = slot_offsets
+        # Entries: (signal_name, slot, shift, mask, sign_bit, scale, offset)
+        # mask == 0 -> the slot is the whole value, scale None -> no conversion
+        self.signals = signals
+        if signal_ids is None:
+            self.keys = {entry[0]: entry[0] for entry in signals}
+        else:
+            self.keys = {entry[0]: signal_ids[entry[0]] for entry in signals}
+        self.decode_all = self._build_decode(signals)
+        self.decode_every = self.decode_all if signal_ids is None else self._build_decode(signals, self.keys)
+        self.active = signals
+        self.decode = self.decode_every
+
+        # Structured dtype with the same slots, so a stack of payloads can be viewed with np.frombuffer
+        self.dtype = np.dtype({
+            "names": [f"r{i}" for i in range(len(self.slot_codes))],
+            "formats": [_NUMPY_CODES[c] for c in self.slot_codes],
+            "offsets": slot_offsets,
+            "itemsize": length,
+        })
+
+    def select(self, signal_names: set | None):
+        """Only decode signal_names from now on, None selects every signal."""
+        active = self.signals if signal_names is None else [e for e in self.signals if e[0] in signal_names]
+        if active == self.active:
+            return
+        if len(active) == len(self.signals):
+            decode = self.decode_every
+        elif not active:
+            decode = _decode_nothing
+        else:
+            decode = self._build_decode(active, self.keys)
+        self.decode = decode
+        self.active = active
+
+    def _build_decode(self, entries: list, keys: dict | None = None):
+        # Unpack just the slots these entries read, skipping the rest as padding
+        used = sorted({entry[1] for entry in entries})
+        fmt = "<"
+        position = 0
+        for slot in used:
+            offset, code = self.slot_offsets[slot], self.slot_codes[slot]
+            fmt += "x" * (offset - position) + code
+            position = offset + struct.calcsize("<" + code)
+
+        slots = "".join(f"r{slot}, " for slot in used)
+        items = []
+        for name, slot, shift, mask, sign_bit, scale, offset in entries:
+            expr = f"r{slot}"
+            if mask:
+                expr = f"(({expr} >> {shift}) & {mask})"
+                if sign_bit:
+                    expr = f"(({expr} ^ {sign_bit}) - {sign_bit})"
+            if scale is not None:
+                # Same arithmetic as cantools' raw_to_scaled so values are bit identical
+                expr = f"{expr} * {scale!r} + {offset!r}"
+            items.append(f"{(keys[name] if keys else name)!r}: {expr}")
+
+        source = (
+            "def decode(data):\n"
+            f"    {slots}= unpack_from(data)\n"
+            f"    return {{{', '.join(items)}}}\n"
+        )
+        namespace = {"unpack_from": struct.Struct(fmt).unpack_from}
+        exec(source, namespace)
+        return namespace["decode"]
+
+
+def compile_message(message: Message, signal_ids: dict | None = None) -> FrameLayout | None:
+    """Compile a message into a FrameLayout, or return None if it needs cantools.
+
+    Only little endian signals that are either byte aligned 8/16/32/64 bit fields
+    or bit fields inside a single byte are supported (the layouts made by db-maker.py).
+    """
+    if message.is_multiplexed() or not message.signals:
+        return None
+
+    aligned = {}    # byte offset -> (code, size, signal)
+    bit_bytes = {}  # byte offset -> [signals]
+
+    for signal in message.signals:
+        if signal.byte_order != "little_endian" or signal.choices:
+            return None
+
+        first_byte, last_byte = signal.start // 8, (signal.start + signal.length - 1) // 8
+
+        if signal.start % 8 == 0 and signal.length in (8, 16, 32, 64):
+            if signal.is_float:
+                code = _FLOAT_CODES.get(signal.length)
+            else:
+                code = _INT_CODES[(signal.length, signal.is_signed)]
+            if code is None or first_byte in aligned:
+                return None
+            aligned[first_byte] = (code, signal.length // 8, signal)
+        elif first_byte == last_byte and not signal.is_float:
+            bit_bytes.setdefault(first_byte, []).append(signal)
+        else:
+            return None
+
+    # Lay out the slots in byte order, padding the gaps
+    slots = [(offset, code, size, [signal], False) for offset, (code, size, signal) in aligned.items()]
+    slots += [(offset, "B", 1, signals, True) for offset, signals in bit_bytes.items()]
+    slots.sort(key=lambda s: s[0])
+
+    fmt = "<"
+    position = 0
+    entries = []
+    slot_offsets = []
+    for slot, (offset, code, size, signals, is_bits) in enumerate(slots):
+        if offset < position:
+            return None  # overlapping fields
+        fmt += "x" * (offset - position) + code
+        position = offset + size
+        slot_offsets.append(offset)
+
+        for signal in signals:
+            if is_bits:
+                shift = signal.start % 8
+                mask = (1 << signal.length) - 1
+                sign_bit = 1 << (signal.length - 1) if signal.is_signed else 0
+            else:
+                shift, mask, sign_bit = 0, 0, 0
+
+            conversion = signal.conversion
+            if conversion.scale == 1 and conversion.offset == 0:
+                scale, offset_value = None, 0
+            else:
+                scale, offset_value = conversion.scale, conversion.offset
+
+            entries.append((signal.name, slot, shift, mask, sign_bit, scale, offset_value))
+
+    if position > message.length:
+        return None
+
+    return FrameLayout(message.name, message.frame_id, message.length, struct.Struct(fmt), slot_offsets, entries,
+                       signal_ids)
+
+
+class FastDecoder:
+    """Decodes CAN frames through precompiled FrameLayouts, falling back to cantools.
+
+    decode() behaves like Database.decode_message(): it returns a {signal: value} dict
+    and raises KeyError for frame IDs that are not in the database.
+
+    Consumers (widgets, the plot, the SoC estimate, ...) can subscribe() to the
+    signals they need. Once any subscription exists, decode() and decode_batch()
+    only extract the union of them; decode_all() still returns every signal.
+
+    Given signal_ids (a SignalStore's name -> ID table, covering every signal of
+    the DBC), decode() and decode_batch() key their results by those integer IDs
+    instead of names. decode_all() and subscriptions always use names.
+    """
+    def __init__(self, db: Database, signal_ids: dict | None = None):
+        self.db = db
+        self.signal_ids = signal_ids
+        self.layouts: dict[int, FrameLayout] = {}
+        self.message_names: dict[int, str] = {}
+        self.subscriptions: dict[str, set] = {}
+        self.subscribed: set | None = None      # None: nothing subscribed, decode everything
+        # Frame IDs with a subscribed signal, i.e. frames that reach the store. Updated in place,
+        # so an IngestBuffer holding this set follows subscription changes
+        self.history_ids = {message.frame_id for message in db.messages}
+
+        for message in db.messages:
+            self.message_names[message.frame_id] = message.name
+            layout = compile_message(message, signal_ids)
+            if layout is not None:
+                self.layouts[message.frame_id] = layout
+
+    @classmethod
+    def from_file(cls, dbc_path: str, signal_ids: dict | None = None) -> "FastDecoder":
+        return cls(cantools.database.load_file(dbc_path), signal_ids)
+
+    @property
+    def fallback_ids(self) -> list[int]:
+        """Frame IDs that could not be compiled and are decoded by cantools."""
+        return [frame_id for frame_id in self.message_names if frame_id not in self.layouts]
+
+    def message_name(self, frame_id: int) -> str:
+        return self.message_names[frame_id]
+
+    def subscribe(self, consumer: str, signal_names):
+        """Set the signals consumer needs, replacing its previous subscription."""
+        self.subscriptions[consumer] = set(signal_names)
+        self._apply_subscriptions()
+
+    def unsubscribe(self, consumer: str):
+        if self.subscriptions.pop(consumer, None) is not None:
+            self._apply_subscriptions()
+
+    def _apply_subscriptions(self):
+        subscribed = set().union(*self.subscriptions.values()) if self.subscriptions else None
+        for layout in self.layouts.values():
+            layout.select(subscribed)
+        self.subscribed = subscribed
+
+        history_ids = {message.frame_id for message in self.db.messages
+                       if subscribed is None or any(signal.name in subscribed for signal in message.signals)}
+        # Add before removing, so a concurrent lookup never sees an empty set
+        self.history_ids |= history_ids
+        self.history_ids &= history_ids
+
+    def decode(self, frame_id: int, data: bytes) -> dict:
+        """Decode the subscribed signals of a frame ({} if it has none), keyed by ID with signal_ids."""
+        layout = self.layouts.get(frame_id)
+        if layout is None:
+            return self._decode_cantools(frame_id, data)
+
+        try:
+            return layout.decode(data)
+        except struct.error:
+            # Truncated frame, let cantools raise its usual DecodeError
+            return self._decode_cantools(frame_id, data)
+
+    def decode_all(self, frame_id: int, data: bytes) -> dict:
+        """Decode every signal of a frame, regardless of subscriptions."""
+        layout = self.layouts.get(frame_id)
+        if layout is None:
+            return self.db.decode_message(frame_id, data)
+
+        try:
+            return layout.decode_all(data)
+        except struct.error:
+            return self.db.decode_message(frame_id, data)
+
+    def _decode_cantools(self, frame_id: int, data: bytes) -> dict:
+        decoded = self.db.decode_message(frame_id, data)
+        subscribed = self.subscribed
+        ids = self.signal_ids
+        if ids is None:
+            if subscribed is None:
+                return decoded
+            return {name: value for name, value in decoded.items() if name in subscribed}
+        return {ids[name]: value for name, value in decoded.items() if subscribed is None or name in subscribed}
+
+    def decode_batch(self, frames: list) -> tuple[dict, list]:
+        """Decode a batch of can.Messages with one vectorized pass per compiled layout.
+
+        Returns (groups, rest). groups maps frame_id -> (timestamps, {signal: values}),
+        both as NumPy arrays in arrival order, with only the subscribed signals (keyed
+        like decode()). rest
+        holds, in arrival order, the frames that still need decode(): unknown IDs,
+        cantools-only layouts, odd payload lengths and frames with no subscribed signal.
+        """
+        layouts = self.layouts
+        buckets = {}
+        rest = []
+        for msg in frames:
+            layout = layouts.get(msg.arbitration_id)
+            if layout is None or not layout.active or len(msg.data) != layout.length:
+                rest.append(msg)
+                continue
+            bucket = buckets.get(msg.arbitration_id)
+            if bucket is None:
+                bucket = buckets[msg.arbitration_id] = ([], [])
+            bucket[0].append(msg.data)
+            bucket[1].append(msg.timestamp)
+
+        groups = {}
+        for frame_id, (payloads, timestamps) in buckets.items():
+            layout = layouts[frame_id]
+            raw = np.frombuffer(b"".join(payloads), dtype=layout.dtype)
+
+            columns = {}
+            keys = layout.keys
+            for name, slot, shift, mask, sign_bit, scale, offset in layout.active:
+                column = raw[f"r{slot}"]
+                if mask:
+                    column = (column.astype(np.int64) >> shift) & mask
+                    if sign_bit:
+                        column = (column ^ sign_bit) - sign_bit
+                if scale is not None:
+                    column = column * scale + offset
+                columns[keys[name]] = column
+
+            groups[frame_id] = (np.array(timestamps, dtype=np.float64), columns)
+
+        return groups, rest
@@ -1,3 +1,4 @@
+import bisect
 import can
 import cantools
 from cantools.database.can import Message, Signal, Database, Node
@@ -74,6 +75,13 @@ def plot(data_log):
     for msg_name, data in data_log.items():
         timestamps = data["timestamps"]
 
+        # Only the samples inside time_range, found by bisection (log timestamps are in order)
+        first, last = 0, len(timestamps)
+        if time_range:
+            first = bisect.bisect_left(timestamps, time_range[0])
+            last = bisect.bisect_right(timestamps, time_range[1])
+            timestamps = timestamps[first:last]
+
         if not timestamps:
             continue
 
@@ -89,7 +97,7 @@ def plot(data_log):
 
         for i, signal_name in enumerate(signals):
             ax = axs[i]
-            values = data["values"][signal_name]
+            values = data["values"][signal_name][first:last]
             unit = data_units.get(signal_name, '')
             label = f'{signal_name} [{unit}]' if unit else signal_name
 
@@ -100,7 +108,8 @@ def plot(data_log):
                 ax.set_ylim(yaxis_range)
 
         axs[-1].set_xlabel("Time")
-        plt.xlim(time_range)
+        if time_range:
+            plt.xlim(time_range)
 
         if enable_live_fig:
             plt.tight_layout(rect=[0, 0, 1, 0.96])  # Make room for suptitle
@@ -1,13 +1,20 @@
 import tkinter as tk
 from tkinter import ttk
-import queue
-import datetime
 from pathlib import Path
 import can
 import cantools
 from cantools.database.can import Database
 import math, random, time
 from signal_help import describe_signal
+from fast_decoder import FastDecoder
+from can_pipeline import BusConfig, CANListener, DecodeWorker, IngestBuffer, dbc_can_filters, filter_ids, open_logged_bus
+from can_process import ProcessIngest
+from can_async import AsyncIngest
+from tick_scheduler import TickScheduler
+from signal_store import DEFAULT_CAPACITY, SignalStore
+from session_history import SessionHistory
+from color_scale import build_scales
+from pack_state import CELL_FIELDS, VOLTAGE, VOLTAGE_DIFF, TEMP, DISCHARGING, FAULT, PackState, pack_topology
 from tkinter import messagebox
 
 # Matplotlib for plotting
@@ -42,6 +49,16 @@ SOC_VOLTAGE_TABLE_1C = [
     (2.80, 0),
 ]
 
+# Plot span choices: label -> seconds, 0 plots the last 500 raw samples, None everything held
+PLOT_SPANS = {"Last 500": 0, "1 min": 60, "10 min": 600, "1 h": 3600, "8 h": 28800, "All": None}
+PLOT_MAX_POINTS = 600
+
+# Target refresh rates offered in the toolbar, frames per second
+FPS_CHOICES = (5, 10, 30)
+
+# Per-segment signals SEG_<n>_<field>, in SegmentWidget.update_data order
+SEGMENT_FIELDS = ("IC_Voltage", "IC_Temp", "isFaultDetected", "isCommsError")
+
 def voltage_to_soc_percent(cell_v: float, table=SOC_VOLTAGE_TABLE_1C) -> float:
     """Map cell voltage to SoC% using piecewise-linear interpolation."""
     if cell_v is None or math.isnan(cell_v):
@@ -70,34 +87,42 @@ def apply_theme(root, theme: str):
     sv_ttk.set_theme(theme)
 
 
-def interpolate_color(value: float, min_val: float, max_val: float, start_hex: str, end_hex: str) -> str:
-    """Interpolates a color based on a value within a range."""
-    if value is None:
-        return "#808080"
-    value = max(min_val, min(value, max_val))
+def format_cell(voltage, voltageDiff, temp, is_faulted, is_discharging, tile_bg: str, scales: dict) -> tuple:
+    """(text, bg) of each CELL_FIELDS box of a cell tile, None for values not received yet."""
+    return (
+        (f"{voltage:5.3f} V", scales["cell_voltage"](voltage)) if voltage is not None else None,
+        (f"{int(voltageDiff):+4d} mV", scales["imbalance"](abs(int(voltageDiff)))) if voltageDiff is not None else None,
+        (f"{temp:6.2f} °C", scales["temperature"](temp)) if temp is not None else None,
+        ("DC", "#0000FF" if is_discharging else tile_bg),
+        ("FT", "#FF0000" if is_faulted else tile_bg),
+    )
 
-    s_r, s_g, s_b = int(start_hex[1:3], 16), int(start_hex[3:5], 16), int(start_hex[5:7], 16)
-    e_r, e_g, e_b = int(end_hex[1:3], 16), int(end_hex[3:5], 16), int(end_hex[5:7], 16)
 
-    ratio = (value - min_val) / (max_val - min_val)
+class RenderCache:
+    """Mixin for Tk widgets: show() remembers the options it set and skips the ones already shown.
 
-    n_r = int(s_r + ratio * (e_r - s_r))
-    n_g = int(s_g + ratio * (e_g - s_g))
-    n_b = int(s_b + ratio * (e_b - s_b))
+    Every config() is a round trip into Tcl, and most tiles show the same text and
+    colour tick after tick. Options must only be changed through show() to keep the
+    cache truthful.
+    """
+    _shown = None
 
-    return f"#{n_r:02x}{n_g:02x}{n_b:02x}"
+    def show(self, **options):
+        shown = self._shown
+        if shown is None:
+            shown = self._shown = {}
+        changed = {key: value for key, value in options.items() if shown.get(key) != value}
+        if changed:
+            shown.update(changed)
+            self.config(**changed)
 
 
-class CANListener(can.Listener):
-    """A can.Listener that puts received messages into a queue."""
-    def __init__(self, msg_queue: queue.Queue):
-        self.queue = msg_queue
+class CachedLabel(RenderCache, tk.Label):
+    pass
 
-    def on_message_received(self, msg: can.Message):
-        self.queue.put(msg)
 
-    def on_error(self, exc: Exception):
-        print(f"An error occurred in the CAN listener: {exc}")
+class CachedTtkLabel(RenderCache, ttk.Label):
+    pass
 
 
 class SegmentWidget(ttk.Frame):
@@ -105,6 +130,11 @@ class SegmentWidget(ttk.Frame):
     def __init__(self, parent, seg_id: int, select_callback, plot_callback):
         super().__init__(parent, borderwidth=1, relief="solid")
         self.seg_id = seg_id
+        app = parent.winfo_toplevel()
+        self.colors = app.colors        # THEME entry, replaced by apply_theme()
+        self.scales = app.color_scales
+        self.values = (None,) * len(SEGMENT_FIELDS)     # last update_data() arguments
+        self.signal_ids = ()            # store IDs of the SEGMENT_FIELDS signals, set by the Application
 
         self.columnconfigure(0, weight=5)
         self.columnconfigure(1, weight=1)
@@ -112,12 +142,12 @@ class SegmentWidget(ttk.Frame):
         self.rowconfigure(0, weight=1)
         self.rowconfigure(1, weight=1)
 
-        tile = dict(bg="#505050", fg="white", font=("Consolas", 9))
+        tile = dict(bg=self.colors["tile_bg"], fg=self.colors["tile_fg"], font=("Consolas", 9))
 
-        self.voltage_label = tk.Label(self, anchor="center", **tile)
-        self.temp_label = tk.Label(self, anchor="center", **tile)
-        self.fault_label = tk.Label(self, anchor="center", text="FT", **tile)
-        self.commsFault_label = tk.Label(self, anchor="center", text="CF", **tile)
+        self.voltage_label = CachedLabel(self, anchor="center", **tile)
+        self.temp_label = CachedLabel(self, anchor="center", **tile)
+        self.fault_label = CachedLabel(self, anchor="center", text="FT", **tile)
+        self.commsFault_label = CachedLabel(self, anchor="center", text="CF", **tile)
 
         self.voltage_label.grid(row=0, column=0, columnspan=3, sticky="nsew", pady=1)
         self.temp_label.grid(row=1, column=0, sticky="nsew", padx=(0, 1))
@@ -140,19 +170,29 @@ class SegmentWidget(ttk.Frame):
         self.commsFault_label.bind("<Button-1>", lambda e: [select_callback(self.seg_id), plot_callback(comms_fault_signal)])
 
     def update_data(self, voltage: float, temp: float, is_faulted: bool, is_comms_fault: bool):
+        self.values = (voltage, temp, is_faulted, is_comms_fault)
+        scales = self.scales
         if voltage is not None:
-            self.voltage_label.config(text=f"{voltage:7.3f} V")
-            self.voltage_label.config(bg=interpolate_color(voltage, 48.0, 67.2, "#FF0000", "#00FF00"))
+            self.voltage_label.show(text=f"{voltage:7.3f} V", bg=scales["segment_voltage"](voltage))
 
         if temp is not None:
-            self.temp_label.config(text=f"{temp:6.2f} °C")
-            self.temp_label.config(bg=interpolate_color(temp, 10, 100, "#00FF00", "#FF0000"))
+            self.temp_label.show(text=f"{temp:6.2f} °C", bg=scales["temperature"](temp))
 
-        app = self.winfo_toplevel()
-        t = THEME[app.theme]
+        t = self.colors
 
-        self.fault_label.config(bg="#FF0000" if is_faulted else t["tile_bg"], fg=t["tile_fg"])
-        self.commsFault_label.config(bg="#FFA500" if is_comms_fault else t["tile_bg"], fg=t["tile_fg"])
+        self.fault_label.show(bg="#FF0000" if is_faulted else t["tile_bg"], fg=t["tile_fg"])
+        self.commsFault_label.show(bg="#FFA500" if is_comms_fault else t["tile_bg"], fg=t["tile_fg"])
+
+    def apply_theme(self, colors: dict):
+        """Switch to a THEME entry, alert and value colours are redone from the last values."""
+        self.colors = colors
+        voltage, temp = self.values[:2]
+        for label, value in ((self.voltage_label, voltage), (self.temp_label, temp)):
+            if value is None:
+                label.show(bg=colors["tile_bg"], fg=colors["tile_fg"])
+            else:
+                label.show(fg=colors["tile_fg"])
+        self.update_data(*self.values)
 
 
 class CellWidget(ttk.Frame):
@@ -160,6 +200,10 @@ class CellWidget(ttk.Frame):
     def __init__(self, parent, cell_id: tuple, select_callback, plot_callback):
         super().__init__(parent, borderwidth=1, relief="solid")
         self.cell_id = cell_id  # (row, col)
+        app = parent.winfo_toplevel()
+        self.colors = app.colors        # THEME entry, replaced by apply_theme()
+        self.scales = app.color_scales
+        self.values = (None,) * len(CELL_FIELDS)    # last update_data() arguments
 
         self.columnconfigure(0, weight=5)
         self.columnconfigure(1, weight=1)
@@ -167,19 +211,21 @@ class CellWidget(ttk.Frame):
         self.rowconfigure(0, weight=1)
         self.rowconfigure(1, weight=1)
 
-        tile = dict(bg="#505050", fg="white", font=("Consolas", 9))
+        tile = dict(bg=self.colors["tile_bg"], fg=self.colors["tile_fg"], font=("Consolas", 9))
 
-        self.voltage_label = tk.Label(self, anchor="center", **tile)
-        self.voltageDiff_label = tk.Label(self, anchor="center", **tile)
-        self.temp_label = tk.Label(self, anchor="center", **tile)
-        self.fault_label = tk.Label(self, anchor="center", text="FT", **tile)
-        self.discharging_label = tk.Label(self, anchor="center", text="DC", **tile)
+        self.voltage_label = CachedLabel(self, anchor="center", **tile)
+        self.voltageDiff_label = CachedLabel(self, anchor="center", **tile)
+        self.temp_label = CachedLabel(self, anchor="center", **tile)
+        self.fault_label = CachedLabel(self, anchor="center", text="FT", **tile)
+        self.discharging_label = CachedLabel(self, anchor="center", text="DC", **tile)
 
         self.voltage_label.grid(row=0, column=0, sticky="nsew", pady=1, padx=(0, 1))
         self.voltageDiff_label.grid(row=0, column=1, columnspan=2, sticky="nsew", pady=1)
         self.temp_label.grid(row=1, column=0, sticky="nsew", padx=(0, 1))
         self.fault_label.grid(row=1, column=1, sticky="nsew", padx=(0, 1))
         self.discharging_label.grid(row=1, column=2, sticky="nsew")
+        # In format_cell() order
+        self.labels = (self.voltage_label, self.voltageDiff_label, self.temp_label, self.discharging_label, self.fault_label)
 
         row, col = self.cell_id
         seg = col + 1
@@ -204,23 +250,200 @@ class CellWidget(ttk.Frame):
         self.discharging_label.bind("<Button-1>", lambda e: [select_callback(self.cell_id), plot_callback(discharge_signal)])
 
     def update_data(self, voltage: float, voltageDiff: int, temp: float, is_faulted: bool, is_discharging: bool):
-        if voltage is not None:
-            self.voltage_label.config(text=f"{voltage:5.3f} V")
-            self.voltage_label.config(bg=interpolate_color(voltage, 3.0, 4.2, "#FF0000", "#00FF00"))
+        self.values = (voltage, voltageDiff, temp, is_faulted, is_discharging)
+        t = self.colors
+        for label, box in zip(self.labels, format_cell(*self.values, t["tile_bg"], self.scales)):
+            if box is not None:
+                label.show(text=box[0], bg=box[1], fg=t["tile_fg"])
+
+    def apply_theme(self, colors: dict):
+        """Switch to a THEME entry, alert and value colours are redone from the last values."""
+        self.colors = colors
+        for label, box in zip(self.labels, format_cell(*self.values, colors["tile_bg"], self.scales)):
+            label.show(bg=colors["tile_bg"] if box is None else box[1], fg=colors["tile_fg"])
+
+
+class CellCanvas(tk.Canvas):
+    """The whole cell grid drawn on one canvas: a rectangle and a text item per cell field.
+
+    Replaces segments x cells CellWidgets (5 labels each) with two canvas items per
+    field, updated with itemconfigure() through a skip-unchanged cache like RenderCache.
+    Columns are segments, rows are cells. Clicks are mapped back to cell and field from
+    the pointer position, so click-to-plot and right-click signal info work as on the
+    widgets, and the item count grows linearly with the pack.
+
+    Rows are created when they first scroll into view (see set_scrollbar()); values of
+    rows not built yet are kept and drawn when they are.
+    """
+    TILE_HEIGHT = 36
+    # Box of each CELL_FIELDS entry inside a tile, as fractions of its width and height
+    BOXES = {
+        VOLTAGE: (0, 0, 5 / 7, 0.5), VOLTAGE_DIFF: (5 / 7, 0, 1, 0.5),
+        TEMP: (0, 0.5, 5 / 7, 1), FAULT: (5 / 7, 0.5, 6 / 7, 1), DISCHARGING: (6 / 7, 0.5, 1, 1),
+    }
+    LABELS = {FAULT: "FT", DISCHARGING: "DC"}
+
+    def __init__(self, parent, segments: int, cells: int, select_callback, plot_callback, info_callback):
+        super().__init__(parent, highlightthickness=0)
+        app = parent.winfo_toplevel()
+        self.colors = app.colors        # THEME entry, replaced by apply_theme()
+        self.scales = app.color_scales
+        self.segments = segments
+        self.cells = cells
+        self.select_callback = select_callback
+        self.plot_callback = plot_callback
+        self.info_callback = info_callback
+
+        self.configure(bg=self.colors["pack_bg"])
+        self._values = [(None,) * len(CELL_FIELDS)] * (segments * cells)    # last format_cell() values per tile
+        self._shown = {}                # canvas item -> {option: value} last set
+        self._built = [False] * cells   # rows whose items exist
+        self._rects = [None] * (segments * cells * len(CELL_FIELDS))    # index (row * segments + col) * fields + field
+        self._texts = [None] * len(self._rects)
+        self._selection = self.create_rectangle(0, 0, 0, 0, outline=self.colors["tile_fg"], width=3)
+        self._selected = None
+        self._tile_width = 1.0
+
+        self.bind("<Configure>", self._layout)
+        self.bind("<Button-1>", self._on_click)
+        self.bind("<Button-3>", self._on_right_click)
+
+    def update_cell(self, row: int, col: int, values: tuple):
+        """Show one tile's values, in format_cell() argument order."""
+        tile = row * self.segments + col
+        self._values[tile] = values
+        if self._built[row]:
+            self._draw_tile(tile, values, False)
+
+    def set_scrollbar(self, scrollbar: ttk.Scrollbar):
+        """Scroll with scrollbar, building the rows that come into view."""
+        def on_view(first, last):
+            scrollbar.set(first, last)
+            self._build_visible()
+        self.configure(yscrollcommand=on_view)
+        scrollbar.configure(command=self.yview)
+
+    def _draw_tile(self, tile: int, values: tuple, idle: bool):
+        """Draw the boxes that have a value, with idle also reset the ones that don't to the tile colours."""
+        base = tile * len(CELL_FIELDS)
+        show = self._show
+        tile_bg, fg = self.colors["tile_bg"], self.colors["tile_fg"]
+        for field, box in enumerate(format_cell(*values, tile_bg, self.scales)):
+            if box is not None:
+                show(self._rects[base + field], fill=box[1])
+                show(self._texts[base + field], text=box[0], fill=fg)
+            elif idle:
+                show(self._rects[base + field], fill=tile_bg)
+                show(self._texts[base + field], fill=fg)
+
+    def select(self, cell_id: tuple):
+        self._selected = cell_id
+        self._place_selection()
+
+    def apply_theme(self, colors: dict):
+        """Switch to a THEME entry, alert and value colours are redone from the last values."""
+        self.colors = colors
+        self.configure(bg=colors["pack_bg"])
+        for tile, values in enumerate(self._values):
+            if self._built[tile // self.segments]:
+                self._draw_tile(tile, values, True)
+        self.itemconfigure(self._selection, outline=colors["tile_fg"])
+
+    def signal_at(self, event) -> tuple | None:
+        """((row, col), signal name) under the pointer, None outside the grid."""
+        x, y = self.canvasx(event.x), self.canvasy(event.y)
+        col, row = int(x // self._tile_width), int(y // self.TILE_HEIGHT)
+        if not (0 <= col < self.segments and 0 <= row < self.cells):
+            return None
+        fx, fy = x / self._tile_width - col, y / self.TILE_HEIGHT - row
+        for field, (x0, y0, x1, y1) in self.BOXES.items():
+            if x0 <= fx < x1 and y0 <= fy < y1:
+                return (row, col), f"CELL_{col + 1}x{row + 1}_{CELL_FIELDS[field]}"
+        return None
+
+    def _show(self, item: int, **options):
+        shown = self._shown.get(item)
+        if shown is None:
+            shown = self._shown[item] = {}
+        changed = {key: value for key, value in options.items() if shown.get(key) != value}
+        if changed:
+            shown.update(changed)
+            self.itemconfigure(item, **changed)
+
+    def _layout(self, event):
+        # Only on resize: every tile follows the canvas width, rows keep TILE_HEIGHT
+        self._tile_width = max(event.width, 1) / self.segments
+        for row, built in enumerate(self._built):
+            if built:
+                self._place_row(row)
+        self._place_selection()
+        self.configure(scrollregion=(0, 0, event.width, self.cells * self.TILE_HEIGHT))
+        self._build_visible()
+
+    def _build_visible(self):
+        h = self.TILE_HEIGHT
+        top = max(int(self.canvasy(0) // h), 0)
+        bottom = min(int(self.canvasy(self.winfo_height()) // h) + 1, self.cells)
+        for row in range(top, bottom):
+            if not self._built[row]:
+                self._build_row(row)
+
+    def _build_row(self, row: int):
+        tile_bg, tile_fg = self.colors["tile_bg"], self.colors["tile_fg"]
+        fields = len(CELL_FIELDS)
+        for tile in range(row * self.segments, (row + 1) * self.segments):
+            for field in range(fields):
+                self._rects[tile * fields + field] = self.create_rectangle(0, 0, 0, 0, outline="", fill=tile_bg)
+                self._texts[tile * fields + field] = self.create_text(0, 0, text=self.LABELS.get(field, ""),
+                                                                      fill=tile_fg, font=("Consolas", 9))
+        self._built[row] = True
+        self._place_row(row)
+        for tile in range(row * self.segments, (row + 1) * self.segments):
+            self._draw_tile(tile, self._values[tile], False)
+        self.tag_raise(self._selection)
+
+    def _place_row(self, row: int):
+        w, h = self._tile_width, self.TILE_HEIGHT
+        fields = len(CELL_FIELDS)
+        for col in range(self.segments):
+            base = (row * self.segments + col) * fields
+            for field, (x0, y0, x1, y1) in self.BOXES.items():
+                left, top = (col + x0) * w, (row + y0) * h
+                right, bottom = (col + x1) * w - 1, (row + y1) * h - 1
+                self.coords(self._rects[base + field], left, top, right, bottom)
+                self.coords(self._texts[base + field], (left + right) / 2, (top + bottom) / 2)
+
+    def _place_selection(self):
+        if self._selected is None:
+            return
+        row, col = self._selected
+        w, h = self._tile_width, self.TILE_HEIGHT
+        self.coords(self._selection, col * w + 1, row * h + 1, (col + 1) * w - 2, (row + 1) * h - 2)
+        self.tag_raise(self._selection)
 
-        if voltageDiff is not None:
-            self.voltageDiff_label.config(text=f"{int(voltageDiff):+4d} mV")
-            self.voltageDiff_label.config(bg=interpolate_color(abs(int(voltageDiff)), 0, 500, "#00FF00", "#FF0000"))
+    def _on_click(self, event):
+        hit = self.signal_at(event)
+        if hit is not None:
+            self.select_callback(hit[0])
+            self.plot_callback(hit[1])
 
-        if temp is not None:
-            self.temp_label.config(text=f"{temp:6.2f} °C")
-            self.temp_label.config(bg=interpolate_color(temp, 10, 100, "#00FF00", "#FF0000"))
+    def _on_right_click(self, event):
+        hit = self.signal_at(event)
+        if hit is not None:
+            self.info_callback(hit[1])
 
-        app = self.winfo_toplevel()
-        t = THEME[app.theme]
 
-        self.fault_label.config(bg="#FF0000" if is_faulted else t["tile_bg"], fg=t["tile_fg"])
-        self.discharging_label.config(bg="#0000FF" if is_discharging else t["tile_bg"], fg=t["tile_fg"])
+class CanvasCell:
+    """One tile of a CellCanvas, with CellWidget's update_data() so the render path treats both alike."""
+    __slots__ = ("grid", "cell_id")
+
+    def __init__(self, grid: CellCanvas, cell_id: tuple):
+        self.grid = grid
+        self.cell_id = cell_id  # (row, col)
+
+    def update_data(self, voltage: float, voltageDiff: int, temp: float, is_faulted: bool, is_discharging: bool):
+        row, col = self.cell_id
+        self.grid.update_cell(row, col, (voltage, voltageDiff, temp, is_faulted, is_discharging))
 
 
 class SystemInfoFrame(ttk.Frame):
@@ -238,29 +461,54 @@ class SystemInfoFrame(ttk.Frame):
         ttk.Label(self, text="Current:", font=("Helvetica", 32), anchor="w").grid(row=1, column=0, sticky="nsew", padx=5)
         ttk.Label(self, text="SoC:",     font=("Helvetica", 32), anchor="w").grid(row=2, column=0, sticky="nsew", padx=5)
 
-        self.voltage_value_label = tk.Label(self, text="--- V", font=("Segoe UI", 32), cursor="hand2",
+        self.voltage_value_label = CachedLabel(self, text="--- V", font=("Segoe UI", 32), cursor="hand2",
                                             bg="#2b2b2b", fg="white", anchor="center")
         self.voltage_value_label.grid(row=0, column=1, sticky="nsew", pady=3)
 
-        self.current_value_label = tk.Label(self, text="--- A", font=("Segoe UI", 32), cursor="hand2",
+        self.current_value_label = CachedLabel(self, text="--- A", font=("Segoe UI", 32), cursor="hand2",
                                             bg="#2b2b2b", fg="white", anchor="center")
         self.current_value_label.grid(row=1, column=1, sticky="nsew")
 
-        self.soc_value_label = tk.Label(self, text="--- %", font=("Segoe UI", 32), cursor="hand2",
+        self.soc_value_label = CachedLabel(self, text="--- %", font=("Segoe UI", 32), cursor="hand2",
                                         bg="#2b2b2b", fg="white", anchor="center")
         self.soc_value_label.grid(row=2, column=1, sticky="nsew", pady=3)
 
+        # Pack-wide cell statistics from PackState
+        self.pack_stats_label = CachedTtkLabel(self, text="", font=("Consolas", 10), anchor="w")
+        self.pack_stats_label.grid(row=3, column=0, columnspan=2, sticky="nsew", padx=5)
+
         self.voltage_value_label.bind("<Button-1>", lambda e: plot_callback("BMS_Pack_Voltage"))
         self.current_value_label.bind("<Button-1>", lambda e: plot_callback("BMS_Pack_Current"))
         self.soc_value_label.bind("<Button-1>",     lambda e: plot_callback("BMS_Pack_SoC"))
 
     def update_values(self, voltage, current, soc):
-        self.voltage_value_label.config(text=f"{voltage:.2f} V" if voltage is not None else "--- V")
-        self.current_value_label.config(text=f"{current:.2f} A" if current is not None else "--- A")
-        self.soc_value_label.config(text=f"{soc:.1f} %" if soc is not None else "--- %")
+        self.voltage_value_label.show(text=f"{voltage:.2f} V" if voltage is not None else "--- V")
+        self.current_value_label.show(text=f"{current:.2f} A" if current is not None else "--- A")
+        self.soc_value_label.show(text=f"{soc:.1f} %" if soc is not None else "--- %")
+
+    def update_pack_stats(self, stats: dict | None):
+        if stats is None:
+            self.pack_stats_label.show(text="")
+            return
+        seg, cell = stats["v_min_cell"]
+        text = (f"Cells {stats['v_min']:.3f}-{stats['v_max']:.3f} V  (low S{seg}C{cell})  "
+                f"spread {stats['v_spread'] * 1000:.0f} mV")
+        if stats["t_max"] is not None:
+            text += f"  max {stats['t_max']:.1f} °C"
+        self.pack_stats_label.show(text=text)
 
 
 class LogFrame(ttk.LabelFrame):
+    """Newest line per CAN ID of the frames no widget shows.
+
+    log_message() only updates an in-memory model (CAN ID -> row, row -> entry).
+    The Listbox is refreshed at most every REFRESH_MS and only rows that changed
+    since are rewritten, so a high-rate bus costs a dict update per frame instead
+    of a Listbox delete and insert. Lines are stamped with the frame's timestamp.
+    """
+    MAX_ROWS = 500
+    REFRESH_MS = 250
+
     def __init__(self, parent):
         super().__init__(parent, text="Other CAN Data", padding=5)
         self.columnconfigure(0, weight=1)
@@ -283,37 +531,77 @@ class LogFrame(ttk.LabelFrame):
         v_scrollbar.grid(row=0, column=1, sticky="ns")
         h_scrollbar.grid(row=1, column=0, sticky="ew")
 
-        self.log_order = []
-
-    def log_message(self, msg_content: str, can_id: int):
-        timestamp = datetime.datetime.now().strftime('%H:%M:%S.%f')[:-3]
-        header = f"{timestamp} | ID: {can_id:<#05x}"
-        log_entry = f"{header} | {msg_content}"
-
-        if can_id in self.log_order:
-            try:
-                index = self.log_order.index(can_id)
-                self.text_list.delete(index)
-                self.text_list.insert(index, log_entry)
-            except ValueError:
-                self._add_new_log_entry(log_entry, can_id)
+        self.rows = {}                  # can id -> row, in row order
+        self.entries = []               # row -> (timestamp, frame id, text)
+        self._changed = set()           # rows to rewrite on the next refresh
+        self._listed = 0                # rows in the Listbox
+        self._rebuild = False           # rows were renumbered, rewrite all
+        self._refresh_id = None
+        self._clock = (None, "")        # (second, "HH:MM:SS") formatted last
+
+    def log_message(self, msg_content: str, can_id: int | tuple, timestamp: float | None = None):
+        """Set the line of can_id. timestamp is the frame's (seconds since the epoch), now if None."""
+        # Frames from further buses are keyed (bus index, arbitration id), one row each
+        frame_id = can_id[1] if isinstance(can_id, tuple) else can_id
+        entry = (time.time() if timestamp is None else timestamp, frame_id, msg_content)
+
+        row = self.rows.get(can_id)
+        if row is None:
+            if len(self.entries) >= self.MAX_ROWS:
+                self._drop_oldest()
+            self.rows[can_id] = len(self.entries)
+            self.entries.append(entry)
         else:
-            self._add_new_log_entry(log_entry, can_id)
-
-    def _add_new_log_entry(self, log_entry: str, can_id: int):
-        if len(self.log_order) >= 500:
-            self.log_order.pop(0)
-            self.text_list.delete(0)
-
-        self.log_order.append(can_id)
-        self.text_list.insert(tk.END, log_entry)
-
-        if self.text_list.yview()[1] > 0.99:
-            self.text_list.yview_moveto(1.0)
+            self.entries[row] = entry
+            self._changed.add(row)
+
+        if self._refresh_id is None:
+            self._refresh_id = self.after(self.REFRESH_MS, self._refresh)
+
+    def _drop_oldest(self):
+        # Only with more than MAX_ROWS IDs: renumber the rows, the next refresh rewrites the list
+        del self.rows[next(iter(self.rows))]
+        del self.entries[0]
+        self.rows = {key: row for row, key in enumerate(self.rows)}
+        self._rebuild = True
+
+    def _refresh(self):
+        self._refresh_id = None
+        text_list = self.text_list
+        follow = text_list.yview()[1] > 0.99
+
+        if self._rebuild:
+            text_list.delete(0, tk.END)
+            self._listed = 0
+            self._rebuild = False
+
+        for row in self._changed:
+            if row < self._listed:
+                text_list.delete(row)
+                text_list.insert(row, self._format(self.entries[row]))
+        self._changed.clear()
+
+        if self._listed < len(self.entries):
+            text_list.insert(tk.END, *(self._format(entry) for entry in self.entries[self._listed:]))
+            self._listed = len(self.entries)
+            if follow:
+                text_list.yview_moveto(1.0)
+
+    def _format(self, entry: tuple) -> str:
+        timestamp, frame_id, text = entry
+        second = int(timestamp)
+        if second != self._clock[0]:
+            self._clock = (second, time.strftime('%H:%M:%S', time.localtime(second)))
+        return f"{self._clock[1]}.{int((timestamp - second) * 1000):03d} | ID: {frame_id:<#05x} | {text}"
 
 
 class Application(tk.Tk):
-    def __init__(self, usb_can_path: str, dbc_path: str, bitrate: int):
+    def __init__(self, usb_can_path: str, dbc_path: str, bitrate: int, ingest_mode: str = "thread",
+                 queue_size: int = 50000, overflow_policy: str = "drop_oldest",
+                 extra_buses: list[BusConfig] | None = None, dbc_filter: bool = False, allow_ids: tuple = (),
+                 history_capacity: int = DEFAULT_CAPACITY, history_dir: str | None = None,
+                 grid_renderer: str = "canvas", color_scales: dict | None = None, target_fps: float = 10,
+                 show_render_stats: bool = False):
         super().__init__()
         self.title("BMS CAN Bus Monitor")
         self.geometry("1400x900")
@@ -323,32 +611,97 @@ class Application(tk.Tk):
         self.log_writer = None
         self.log_file = None
         self.start_timestamp = 0
-        self.can_message_queue = queue.Queue()
         self.db: Database = cantools.database.load_file(dbc_path)
-
-        self.data_log = {signal.name: [] for msg in self.db.messages for signal in msg.signals}
-        self.data_units = {signal.name: signal.unit for msg in self.db.messages for signal in msg.signals}
-        # Synthetic signal (not in DBC)
-        self.data_log["BMS_Pack_SoC"] = []
+        # Only accept the DBC's frame IDs (plus allow_ids), dropped on the adapter or before queueing
+        self.can_filters = dbc_can_filters(self.db, allow_ids) if dbc_filter else None
+
+        # Further buses (e.g. the inverter) each bring their own DBC, their signals share the store
+        # The BMS widgets show its signals, so only what they, the plot and SoC subscribe to is decoded
+        self.buses = [BusConfig("bms", usb_can_path, bitrate, dbc_path, dbc_filter=dbc_filter, allow_ids=allow_ids,
+                                record_all=False)]
+        self.buses += extra_buses or []
+        extra_dbs = [cantools.database.load_file(bus.dbc_path) for bus in self.buses[1:]]
+        all_messages = [msg for db in [self.db] + extra_dbs for msg in db.messages]
+
+        self.data_units = {signal.name: signal.unit for msg in all_messages for signal in msg.signals}
         self.data_units["BMS_Pack_SoC"] = "%"
-
-        self.signal_to_widget_map = {}
+        # Fixed-size history per signal (plus the synthetic BMS_Pack_SoC, not in the DBC),
+        # everything is also appended to history_dir/<session>/ unless history_dir is None
+        session = SessionHistory.create(history_dir, self.data_units) if history_dir else None
+        self.store = SignalStore([signal.name for msg in all_messages for signal in msg.signals] + ["BMS_Pack_SoC"],
+                                 capacity=history_capacity, history=session)
+        # The store interns every signal to a dense integer ID; decoders, pack state, widgets
+        # and the plot use these IDs, names only appear at the UI edge
+        self.decoder = FastDecoder(self.db, self.store.ids)
+        self.can_message_queue = IngestBuffer(queue_size, overflow_policy, filter_ids(self.can_filters),
+                                              self.decoder.history_ids)
+        # Pack layout as named by the DBC's CELL_<seg>x<cell>_* and SEG_<seg>_* signals
+        self.num_segments, self.cells_per_segment = pack_topology(self.store.names)
+        # Latest value of every cell signal as one segments x cells array, written by the decode path
+        self.pack = PackState(self.num_segments, self.cells_per_segment, signal_ids=self.store.ids)
+
+        self.signal_widgets = [None] * len(self.store)     # signal ID -> widget showing it
 
         self.segments = []
         self.cells = []
+        self.grid_renderer = grid_renderer  # "canvas": one CellCanvas, "widgets": a CellWidget per cell
+        self.cell_grid = None
         self.selected_segment_id = 1
         self.selected_cell_id = (0, 0)
-        self.plotted_signal_name = None
+        self.plotted_signal = None      # signal ID
+        self._demo_ids = None           # demo signal IDs, resolved on the first demo tick
 
         self.paused = False
         self.demo_mode = True
+        self.target_fps = target_fps    # GUI refresh rate, data is ingested independently of it
+        self.show_render_stats = tk.BooleanVar(value=show_render_stats)
         self.theme = "dark"
+        self.colors = THEME[self.theme]     # current theme's colours, resolved on theme switches only
+        # Tile colour ramps as precomputed palettes, color_scales entries override DEFAULT_SCALES
+        self.color_scales = build_scales(color_scales)
 
         apply_theme(self, self.theme)
 
         self._initialize_ui_layout()
         self._initialize_ui_components()
-        self.signal_to_widget_map["BMS_Pack_SoC"] = self.system_info_frame
+        self._map_signal("BMS_Pack_SoC", self.system_info_frame)
+        self._pack_signals = tuple(self.store.ids[name] for name in ("BMS_Pack_Voltage", "BMS_Pack_Current", "BMS_Pack_SoC"))
+        displayed_signals = {self.store.names[sid] for sid, widget in enumerate(self.signal_widgets) if widget is not None}
+
+        # Decode, storage and SoC run off the Tk thread, the GUI only renders snapshots.
+        # "async" runs buses, decoding, SoC, log flushing and stats as coroutines on one loop thread,
+        # "process" moves the bus, the log file and decoding into their own process.
+        self.ingest_mode = ingest_mode
+        derived = {"BMS_Pack_SoC": self.estimate_pack_soc}
+
+        # Only signals someone subscribed to are decoded, the log file still gets every raw frame
+        self.decoders = [self.decoder] + [FastDecoder(db, self.store.ids) for db in extra_dbs]
+        self.subscribe("widgets", displayed_signals)
+        self.subscribe("pack", self.pack.signal_names)
+        # Further buses have no widgets: without this their samples never reach the store or the session files
+        for decoder, bus in zip(self.decoders, self.buses):
+            if bus.record_all:
+                decoder.subscribe("history", [signal.name for msg in decoder.db.messages for signal in msg.signals])
+
+        if ingest_mode == "async":
+            self.ingest = AsyncIngest(self.decoders, self.store, self.buses,
+                                      displayed_signals=displayed_signals,
+                                      derived=derived, queue_size=queue_size, overflow_policy=overflow_policy,
+                                      pack=self.pack)
+        elif ingest_mode == "process":
+            self.ingest = ProcessIngest(dbc_path, usb_can_path, bitrate, self.store,
+                                        signal_frames={s.name: msg.frame_id for msg in self.db.messages for s in msg.signals},
+                                        displayed_signals=displayed_signals,
+                                        derived=derived, queue_size=queue_size, overflow_policy=overflow_policy,
+                                        can_filters=self.can_filters, subscribed=self.decoder.subscribed,
+                                        pack=self.pack)
+        else:
+            self.ingest = DecodeWorker(self.decoder, self.store, self.can_message_queue,
+                                       displayed_signals=displayed_signals,
+                                       derived=derived, pack=self.pack)
+        if extra_buses and ingest_mode != "async":
+            print(f"Only the BMS bus is captured with ingest_mode '{ingest_mode}', use 'async' for multiple buses")
+        self.ingest.start()
 
         self._initialize_plot()
 
@@ -357,69 +710,68 @@ class Application(tk.Tk):
         if self.demo_mode:
             self.after(200, self._demo_tick)
 
-        self._initialize_can_and_logging(usb_can_path, bitrate)
-
-        self.after(100, self.process_can_messages)
+        if ingest_mode == "thread":
+            self._initialize_can_and_logging(usb_can_path, bitrate)
+
+        # Widgets whose signals changed (dict as an ordered set) and log lines still to render,
+        # carried over when a tick runs out of budget
+        self._dirty = {}
+        self._plot_dirty = False
+        self._pending_other = {}
+        self.tick_scheduler = TickScheduler(self, self.process_can_messages, budget_ms=8.0, target_hz=target_fps,
+                                            queue_depth=self.ingest.queue_depth)
+        self.tick_scheduler.start()
+        self._rx_mark = (0, time.perf_counter())   # (frames received, time) at the last stats update
+        self.after(500, self._update_stats_label)
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.on_segment_selected(1)
         self.on_cell_selected((0, 0))
 
-    def _latest_value(self, signal_name: str):
-        arr = self.data_log.get(signal_name)
-        return arr[-1][1] if arr else None
-
     def estimate_pack_soc(self) -> float | None:
         """Estimate pack SoC% from cell voltages using the 1C curve."""
-        cell_voltages = []
-        for seg in range(1, 8):
-            for cell in range(1, 17):
-                v = self._latest_value(f"CELL_{seg}x{cell}_Voltage")
-                if isinstance(v, (int, float)):
-                    cell_voltages.append(float(v))
-
-        if not cell_voltages:
-            return None
-
         # Choose ONE representative voltage:
-        rep_v = min(cell_voltages)   # conservative (recommended)
-        # rep_v = sum(cell_voltages) / len(cell_voltages)  # smoother alternative
+        rep_v = self.pack.min_voltage()   # conservative (recommended)
+        # rep_v = (self.pack.stats() or {}).get("v_mean")  # smoother alternative
+
+        if rep_v is None:
+            return None
 
         return voltage_to_soc_percent(rep_v)
 
 
+    def subscribe(self, consumer: str, signal_names):
+        """Register the signals a consumer (widgets, plot, SoC, analytics) needs decoded on every bus."""
+        for decoder in self.decoders:
+            decoder.subscribe(consumer, signal_names)
+
     def can_connected(self) -> bool:
+        if self.ingest_mode == "async":
+            return self.ingest.connected
+        if self.ingest_mode == "process":
+            return self.ingest.connected.is_set()
         return self.bus is not None and self.notifier is not None
 
-    def _is_alert_bg(self, bg: str) -> bool:
-        return bg.lower() in ("#ff0000", "#ffa500", "#0000ff")
-
     def apply_custom_theme(self):
-        t = THEME[self.theme]
+        """Recolour the tiles for self.theme from the values they show, no colours are read back from Tk."""
+        t = self.colors
 
-        self.system_info_frame.voltage_value_label.config(bg=t["pack_bg"], fg=t["pack_fg"])
-        self.system_info_frame.current_value_label.config(bg=t["pack_bg"], fg=t["pack_fg"])
+        self.system_info_frame.voltage_value_label.show(bg=t["pack_bg"], fg=t["pack_fg"])
+        self.system_info_frame.current_value_label.show(bg=t["pack_bg"], fg=t["pack_fg"])
 
         for seg in self.segments:
-            if seg is None:
-                continue
-            for lbl in (seg.voltage_label, seg.temp_label, seg.fault_label, seg.commsFault_label):
-                if not self._is_alert_bg(lbl.cget("bg")):
-                    lbl.config(bg=t["tile_bg"], fg=t["tile_fg"])
-                else:
-                    lbl.config(fg=t["tile_fg"])
-
-        for row in self.cells:
-            for cell in row:
-                if cell is None:
-                    continue
-                for lbl in (cell.voltage_label, cell.voltageDiff_label, cell.temp_label, cell.fault_label, cell.discharging_label):
-                    if not self._is_alert_bg(lbl.cget("bg")):
-                        lbl.config(bg=t["tile_bg"], fg=t["tile_fg"])
-                    else:
-                        lbl.config(fg=t["tile_fg"])
+            if seg is not None:
+                seg.apply_theme(t)
+
+        if self.cell_grid is not None:
+            self.cell_grid.apply_theme(t)
+        else:
+            for row in self.cells:
+                for cell in row:
+                    if cell is not None:
+                        cell.apply_theme(t)
 
         self._apply_plot_theme()
-        self.canvas.draw()
+        self.canvas.draw_idle()
 
     def toggle_demo(self):
         if self.can_connected():
@@ -431,23 +783,59 @@ class Application(tk.Tk):
         if self.demo_mode:
             self.after(200, self._demo_tick)
 
+    def ingest_stats(self) -> dict:
+        """Ingest counters (received / dropped / coalesced / queue depth) merged with GUI tick timing."""
+        return dict(self.ingest.stats(), **self.tick_scheduler.stats())
+
+    def _update_stats_label(self):
+        self.tick_scheduler.roll_window()
+        st = self.ingest_stats()
+        self.stats_label.config(
+            text=f"Rx {st['received']}  Filtered {st['filtered']}  Dropped {st['dropped']}  "
+                 f"Coalesced {st['coalesced'] + st['display_coalesced']}  Queue {st['depth']}"
+        )
+
+        now = time.perf_counter()
+        if self.show_render_stats.get():
+            last_received, last_time = self._rx_mark
+            rx_rate = (st["received"] - last_received) / (now - last_time)
+            self.render_stats_label.config(
+                text=f"{st['fps']:4.1f}/{self.tick_scheduler.target_hz:g} FPS  Render {st['frame_ms']:5.1f} ms  "
+                     f"Ingest {rx_rate:6.0f} fr/s  Queue {st['depth']}"
+            )
+        self._rx_mark = (st["received"], now)
+        self.after(500, self._update_stats_label)
+
+    def set_target_fps(self, fps: float):
+        self.target_fps = fps
+        self.tick_scheduler.set_rate(fps)
+
+    def toggle_render_stats(self):
+        if self.show_render_stats.get():
+            self.render_stats_label.pack(side="left", padx=10, pady=6, after=self.stats_label)
+        else:
+            self.render_stats_label.pack_forget()
+
     def toggle_pause(self):
         self.paused = not self.paused
         self.pause_btn.config(text="Resume" if self.paused else "Pause")
 
     def clear_plot(self):
-        if self.plotted_signal_name and self.plotted_signal_name in self.data_log:
-            self.data_log[self.plotted_signal_name].clear()
-        self.update_plot()
+        if self.plotted_signal is None:
+            return
+        # The ingest thread is the store's writer, it reports the clear in the next snapshot
+        self.ingest.clear(self.plotted_signal)
+        self.tick_scheduler.wake()
 
     def toggle_theme(self):
         self.theme = "light" if self.theme == "dark" else "dark"
+        self.colors = THEME[self.theme]
         apply_theme(self, self.theme)
         self.theme_btn.config(text=f"Theme: {'Dark' if self.theme == 'dark' else 'Light'}")
         self.apply_custom_theme()
 
     def _apply_plot_theme(self):
-        t = THEME[self.theme]
+        t = self.colors
         self.fig.set_facecolor(t["plot_bg"])
         self.ax.set_facecolor(t["plot_bg"])
 
@@ -488,42 +876,62 @@ class Application(tk.Tk):
         pack_v = 320 + 10 * math.sin(rt / 5)
         pack_i = 5 * math.sin(rt / 2)
 
-        self._demo_push("BMS_Pack_Voltage", rt, pack_v)
-        self._demo_push("BMS_Pack_Current", rt, pack_i)
-
-        for seg in range(1, 8):
+        if self._demo_ids is None:
+            ids = self.store.ids
+            self._demo_ids = (
+                [ids.get(name) for name in ("BMS_Pack_Voltage", "BMS_Pack_Current")],
+                [[ids.get(f"SEG_{seg}_{field}") for field in SEGMENT_FIELDS] for seg in range(1, self.num_segments + 1)],
+                [[[ids.get(f"CELL_{seg}x{cell}_{field}") for field in CELL_FIELDS]
+                  for cell in range(1, self.cells_per_segment + 1)] for seg in range(1, self.num_segments + 1)],
+            )
+        pack_ids, segment_ids, cell_ids = self._demo_ids
+        values = {pack_ids[0]: pack_v, pack_ids[1]: pack_i}
+
+        for seg in range(1, self.num_segments + 1):
             seg_v = 56 + 2 * math.sin(rt / 3 + seg)
             seg_t = 25 + 5 * math.sin(rt / 4 + seg / 2)
 
-            self._demo_push(f"SEG_{seg}_IC_Voltage", rt, seg_v)
-            self._demo_push(f"SEG_{seg}_IC_Temp", rt, seg_t)
-            self._demo_push(f"SEG_{seg}_isFaultDetected", rt, 1 if random.random() < 0.002 else 0)
-            self._demo_push(f"SEG_{seg}_isCommsError", rt, 1 if random.random() < 0.001 else 0)
+            v_id, t_id, f_id, cf_id = segment_ids[seg - 1]
+            values[v_id] = seg_v
+            values[t_id] = seg_t
+            values[f_id] = 1 if random.random() < 0.002 else 0
+            values[cf_id] = 1 if random.random() < 0.001 else 0
 
-            for cell in range(1, 17):
+            for cell in range(1, self.cells_per_segment + 1):
                 v = 3.75 + 0.08 * math.sin(rt / 2 + (seg * cell) / 20) + random.uniform(-0.005, 0.005)
                 vd = int((v - 3.75) * 1000)
                 temp = 28 + 6 * math.sin(rt / 6 + cell / 5) + random.uniform(-0.2, 0.2)
 
-                self._demo_push(f"CELL_{seg}x{cell}_Voltage", rt, v)
-                self._demo_push(f"CELL_{seg}x{cell}_VoltageDiff", rt, vd)
-                self._demo_push(f"CELL_{seg}x{cell}_Temp", rt, temp)
-                self._demo_push(f"CELL_{seg}x{cell}_isDischarging", rt, 1 if random.random() < 0.02 else 0)
-                self._demo_push(f"CELL_{seg}x{cell}_isFaultDetected", rt, 1 if random.random() < 0.003 else 0)
-
+                v_id, vd_id, t_id, d_id, f_id = cell_ids[seg - 1][cell - 1]
+                values[v_id] = v
+                values[vd_id] = vd
+                values[t_id] = temp
+                values[d_id] = 1 if random.random() < 0.02 else 0
+                values[f_id] = 1 if random.random() < 0.003 else 0
+        values.pop(None, None)          # signals this DBC doesn't have
+
+        # Written by the ingest thread, the store's one writer, which also derives SoC from them.
+        # They come back in its next snapshot and are rendered like decoded frames
+        session = self.store.session
+        if session is not None:
+            session.demo = True
+        self.ingest.post_samples(rt, values)
+        self.tick_scheduler.wake()
         self.after(200, self._demo_tick)
 
-    def _demo_push(self, signal_name, rt, value):
-        if signal_name in self.data_log:
-            self.data_log[signal_name].append((rt, value))
-            if signal_name in self.signal_to_widget_map:
-                self.update_widget_for_signal(signal_name)
-
     def _initialize_ui_layout(self):
         # --- Top toolbar (no title) ---
         toolbar = ttk.Frame(self, padding=(0, 0))
         toolbar.pack(fill="x", pady=0)
 
+        self.stats_label = ttk.Label(toolbar, text="", font=("Consolas", 9))
+        self.stats_label.pack(side="left", padx=10, pady=6)
+
+        # Actual vs target FPS, render time per frame, ingest rate and queue depth
+        self.render_stats_label = ttk.Label(toolbar, text="", font=("Consolas", 9))
+        if self.show_render_stats.get():
+            self.render_stats_label.pack(side="left", padx=10, pady=6)
+
         btn_frame = ttk.Frame(toolbar)
         btn_frame.pack(side="right", padx=10, pady=6)
 
@@ -533,12 +941,28 @@ class Application(tk.Tk):
         self.pause_btn = ttk.Button(btn_frame, text="Pause", command=self.toggle_pause)
         self.pause_btn.pack(side="left", padx=4)
 
+        self.plot_span = tk.StringVar(value="Last 500")
+        self.plot_span_box = ttk.Combobox(btn_frame, textvariable=self.plot_span, values=list(PLOT_SPANS),
+                                          state="readonly", width=9)
+        self.plot_span_box.bind("<<ComboboxSelected>>", lambda e: self.update_plot())
+        self.plot_span_box.pack(side="left", padx=4)
+
         self.clear_plot_btn = ttk.Button(btn_frame, text="Clear plot", command=self.clear_plot)
         self.clear_plot_btn.pack(side="left", padx=4)
 
         self.theme_btn = ttk.Button(btn_frame, text="Theme: Dark", command=self.toggle_theme)
         self.theme_btn.pack(side="left", padx=4)
 
+        self.fps_choice = tk.StringVar(value=f"{self.target_fps:g} FPS")
+        self.fps_box = ttk.Combobox(btn_frame, textvariable=self.fps_choice, values=[f"{fps} FPS" for fps in FPS_CHOICES],
+                                    state="readonly", width=7)
+        self.fps_box.bind("<<ComboboxSelected>>", lambda e: self.set_target_fps(float(self.fps_choice.get().split()[0])))
+        self.fps_box.pack(side="left", padx=4)
+
+        self.render_stats_btn = ttk.Checkbutton(btn_frame, text="Render stats", variable=self.show_render_stats,
+                                                command=self.toggle_render_stats)
+        self.render_stats_btn.pack(side="left", padx=4)
+
         # --- Main content ---
         main_frame = ttk.Frame(self)
         main_frame.pack(fill="both", expand=True, padx=10, pady=0)
@@ -564,25 +988,36 @@ class Application(tk.Tk):
         cell_container.columnconfigure(0, weight=1)
         cell_container.rowconfigure(0, weight=1)
 
-        self.cell_canvas = tk.Canvas(cell_container, highlightthickness=0)
+        if self.grid_renderer == "canvas":
+            # Every cell drawn on this canvas, it lays itself out and sets its scroll region
+            self.cell_grid = self.cell_canvas = CellCanvas(cell_container, self.num_segments, self.cells_per_segment,
+                                                           self.on_cell_selected, self.on_signal_selected_for_plot,
+                                                           self.show_signal_info)
+        else:
+            self.cell_canvas = tk.Canvas(cell_container, highlightthickness=0)
         self.cell_canvas.grid(row=0, column=0, sticky="nsew")
 
-        cell_scroll = ttk.Scrollbar(cell_container, orient="vertical", command=self.cell_canvas.yview)
+        cell_scroll = ttk.Scrollbar(cell_container, orient="vertical")
         cell_scroll.grid(row=0, column=1, sticky="ns")
-        self.cell_canvas.configure(yscrollcommand=cell_scroll.set)
+        if self.cell_grid is not None:
+            self.cell_grid.set_scrollbar(cell_scroll)
+        else:
+            cell_scroll.configure(command=self.cell_canvas.yview)
+            self.cell_canvas.configure(yscrollcommand=cell_scroll.set)
 
-        self.cell_grid_frame = ttk.Frame(self.cell_canvas)
-        self._cell_window = self.cell_canvas.create_window((0, 0), window=self.cell_grid_frame, anchor="nw")
+        if self.cell_grid is None:
+            self.cell_grid_frame = ttk.Frame(self.cell_canvas)
+            self._cell_window = self.cell_canvas.create_window((0, 0), window=self.cell_grid_frame, anchor="nw")
 
-        def _on_cell_configure(event):
-            self.cell_canvas.configure(scrollregion=self.cell_canvas.bbox("all"))
+            def _on_cell_configure(event):
+                self.cell_canvas.configure(scrollregion=self.cell_canvas.bbox("all"))
 
-        def _on_canvas_configure(event):
-            # Make inner frame width track canvas width (prevents weird horizontal clipping)
-            self.cell_canvas.itemconfigure(self._cell_window, width=event.width)
+            def _on_canvas_configure(event):
+                # Make inner frame width track canvas width (prevents weird horizontal clipping)
+                self.cell_canvas.itemconfigure(self._cell_window, width=event.width)
 
-        self.cell_grid_frame.bind("<Configure>", _on_cell_configure)
-        self.cell_canvas.bind("<Configure>", _on_canvas_configure)
+            self.cell_grid_frame.bind("<Configure>", _on_cell_configure)
+            self.cell_canvas.bind("<Configure>", _on_canvas_configure)
 
         # Wheel scroll
         def _on_mousewheel(e):
@@ -607,7 +1042,7 @@ class Application(tk.Tk):
         self.log_frame.grid(row=1, column=0, sticky="nsew")
 
     def _initialize_ui_components(self):
-        num_cols = 7
+        num_cols = self.num_segments
 
         # Segments
         self.segments = [None for _ in range(num_cols)]
@@ -618,35 +1053,39 @@ class Application(tk.Tk):
             w.grid(row=0, column=col, sticky="nsew", padx=1, pady=1)
             self.segments[col] = w
 
-            self.signal_to_widget_map[f"SEG_{seg_id}_IC_Voltage"] = w
-            self.signal_to_widget_map[f"SEG_{seg_id}_IC_Temp"] = w
-            self.signal_to_widget_map[f"SEG_{seg_id}_isFaultDetected"] = w
-            self.signal_to_widget_map[f"SEG_{seg_id}_isCommsError"] = w
+            w.signal_ids = tuple(self._map_signal(f"SEG_{seg_id}_{field}", w) for field in SEGMENT_FIELDS)
 
         # Cells
-        num_rows = 16
+        num_rows = self.cells_per_segment
         self.cells = [[None for _ in range(num_cols)] for _ in range(num_rows)]
 
         for row in range(num_rows):
-            self.cell_grid_frame.rowconfigure(row, weight=1)
+            if self.cell_grid is None:
+                self.cell_grid_frame.rowconfigure(row, weight=1)
             for col in range(num_cols):
-                self.cell_grid_frame.columnconfigure(col, weight=1)
-
-                w = CellWidget(self.cell_grid_frame, (row, col), self.on_cell_selected, self.on_signal_selected_for_plot)
-                w.grid(row=row, column=col, sticky="nsew", padx=1, pady=1)
+                if self.cell_grid is not None:
+                    w = CanvasCell(self.cell_grid, (row, col))
+                else:
+                    self.cell_grid_frame.columnconfigure(col, weight=1)
+                    w = CellWidget(self.cell_grid_frame, (row, col), self.on_cell_selected, self.on_signal_selected_for_plot)
+                    w.grid(row=row, column=col, sticky="nsew", padx=1, pady=1)
                 self.cells[row][col] = w
 
                 seg = col + 1
                 cell_idx = row + 1
 
-                self.signal_to_widget_map[f"CELL_{seg}x{cell_idx}_Voltage"] = w
-                self.signal_to_widget_map[f"CELL_{seg}x{cell_idx}_VoltageDiff"] = w
-                self.signal_to_widget_map[f"CELL_{seg}x{cell_idx}_Temp"] = w
-                self.signal_to_widget_map[f"CELL_{seg}x{cell_idx}_isDischarging"] = w
-                self.signal_to_widget_map[f"CELL_{seg}x{cell_idx}_isFaultDetected"] = w
+                for field in CELL_FIELDS:
+                    self._map_signal(f"CELL_{seg}x{cell_idx}_{field}", w)
+
+        self._map_signal("BMS_Pack_Voltage", self.system_info_frame)
+        self._map_signal("BMS_Pack_Current", self.system_info_frame)
 
-        self.signal_to_widget_map["BMS_Pack_Voltage"] = self.system_info_frame
-        self.signal_to_widget_map["BMS_Pack_Current"] = self.system_info_frame
+    def _map_signal(self, signal_name: str, widget) -> int | None:
+        """Show a signal in widget, returns its ID (None if no DBC has it)."""
+        sid = self.store.ids.get(signal_name)
+        if sid is not None:
+            self.signal_widgets[sid] = widget
+        return sid
 
     def _initialize_plot(self):
         self.fig = Figure(figsize=(5, 2.8), dpi=100)
@@ -658,13 +1097,7 @@ class Application(tk.Tk):
 
     def _initialize_can_and_logging(self, usb_can_path: str, bitrate: int):
         try:
-            self.bus = can.Bus(interface="slcan", channel=usb_can_path, bitrate=bitrate)
-
-            log_filename = f"can_log_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-            log_file_path = Path("logs") / log_filename
-            log_file_path.parent.mkdir(parents=True, exist_ok=True)
-            self.log_file = open(log_file_path, "a", encoding='utf-8', newline='')
-            self.log_writer = can.CanutilsLogWriter(self.log_file)
+            self.bus, self.log_file, self.log_writer = open_logged_bus(usb_can_path, bitrate, can_filters=self.can_filters)
 
             listeners = [CANListener(self.can_message_queue), self.log_writer]
             self.notifier = can.Notifier(self.bus, listeners)
@@ -679,105 +1112,73 @@ class Application(tk.Tk):
             self.notifier = None
             self.bus = None
 
-    def process_can_messages(self):
-        if self.paused:
-            self.after(100, self.process_can_messages)
-            return
-
-        try:
-            while not self.can_message_queue.empty():
-                msg: can.Message = self.can_message_queue.get_nowait()
-
-                if self.start_timestamp == 0:
-                    self.start_timestamp = msg.timestamp
-
-                relative_time = msg.timestamp - self.start_timestamp
-
-                try:
-                    decoded = self.db.decode_message(msg.arbitration_id, msg.data)
-                    is_displayed_on_gui = any(s_name in self.signal_to_widget_map for s_name in decoded.keys())
-
-                    if not is_displayed_on_gui:
-                        try:
-                            message_name = self.db.get_message_by_frame_id(msg.arbitration_id).name
-                            log_content = f"{message_name} {decoded}"
-                        except Exception:
-                            log_content = f"{decoded}"
-                        self.log_frame.log_message(log_content, msg.arbitration_id)
-
-                    for signal_name, value in decoded.items():
-                        if signal_name in self.data_log:
-                            self.data_log[signal_name].append((relative_time, value))
-                            if signal_name in self.signal_to_widget_map:
-                                self.update_widget_for_signal(signal_name)
-
-                except KeyError:
-                    log_content = f"Unknown ID. Data: {' '.join(f'{b:02X}' for b in msg.data)}"
-                    self.log_frame.log_message(log_content, msg.arbitration_id)
-
-                except Exception as e:
-                    print(f"Error decoding or processing message: {e}")
-
-                        # After processing a batch, update SoC once (avoids recalcing 1000x per frame)
-            soc = self.estimate_pack_soc()
-            if soc is not None:
-                # Use "relative_time" from the last processed message in this batch.
-                # If no messages were processed, keep time as-is.
-                t = relative_time if 'relative_time' in locals() else (time.time() - self.start_timestamp if self.start_timestamp else 0.0)
-                self.data_log["BMS_Pack_SoC"].append((t, soc))
-                self.update_widget_for_signal("BMS_Pack_SoC")
-
-        finally:
-            self.after(100, self.process_can_messages)
-
-    def update_widget_for_signal(self, signal_name: str):
-        widget = self.signal_to_widget_map.get(signal_name)
-        if not widget:
-            return
-
-        if isinstance(widget, CellWidget):
+    def process_can_messages(self, deadline: float) -> tuple[int, int]:
+        """GUI tick: render what changed, stopping at the deadline. Returns (processed, remaining)."""
+        if not self.paused:
+            frames, other = self.ingest.take_snapshot()
+            for signals in frames.values():
+                self.mark_dirty(signals)
+            self._pending_other.update(other)
+
+        processed = 0
+        pending_other, dirty = self._pending_other, self._dirty
+
+        while pending_other and time.perf_counter() < deadline:
+            can_id = next(iter(pending_other))
+            timestamp, line = pending_other.pop(can_id)
+            self.log_frame.log_message(line, can_id, timestamp)
+            processed += 1
+
+        # One render per dirty widget, however many of its signals changed
+        while dirty and time.perf_counter() < deadline:
+            widget = next(iter(dirty))
+            del dirty[widget]
+            self.render_widget(widget)
+            processed += 1
+
+        if self._plot_dirty and time.perf_counter() < deadline:
+            self._plot_dirty = False
+            self.update_plot()
+            processed += 1
+
+        return processed, len(pending_other) + len(dirty) + self._plot_dirty
+
+    def mark_dirty(self, signals):
+        """Queue the widgets showing these signal IDs (and the plot) for the next render pass."""
+        dirty = self._dirty
+        signal_widgets = self.signal_widgets
+        for sid in signals:
+            widget = signal_widgets[sid]
+            if widget is not None:
+                dirty[widget] = None
+        if self.plotted_signal in signals:
+            self._plot_dirty = True
+
+    def render_widget(self, widget):
+        """Show the latest values of every signal of a widget."""
+        if isinstance(widget, (CellWidget, CanvasCell)):
             row, col = widget.cell_id
-            seg = col + 1
-            cell_idx = row + 1
+            state = self.pack.cell(col, row)
 
-            v_sig = f"CELL_{seg}x{cell_idx}_Voltage"
-            vd_sig = f"CELL_{seg}x{cell_idx}_VoltageDiff"
-            t_sig = f"CELL_{seg}x{cell_idx}_Temp"
-            d_sig = f"CELL_{seg}x{cell_idx}_isDischarging"
-            f_sig = f"CELL_{seg}x{cell_idx}_isFaultDetected"
-
-            v = self.data_log.get(v_sig, [])[-1][1] if self.data_log.get(v_sig) else None
-            vd = self.data_log.get(vd_sig, [])[-1][1] if self.data_log.get(vd_sig) else None
-            t = self.data_log.get(t_sig, [])[-1][1] if self.data_log.get(t_sig) else None
-            d = self.data_log.get(d_sig, [])[-1][1] if self.data_log.get(d_sig) else None
-            f = self.data_log.get(f_sig, [])[-1][1] if self.data_log.get(f_sig) else None
+            v = state[VOLTAGE]
+            vd = state[VOLTAGE_DIFF]
+            t = state[TEMP]
+            d = state[DISCHARGING]
+            f = state[FAULT]
 
             widget.update_data(voltage=v, voltageDiff=vd, temp=t, is_faulted=f, is_discharging=d)
 
         elif isinstance(widget, SegmentWidget):
-            seg_id = widget.seg_id
-
-            v_sig = f"SEG_{seg_id}_IC_Voltage"
-            t_sig = f"SEG_{seg_id}_IC_Temp"
-            f_sig = f"SEG_{seg_id}_isFaultDetected"
-            cf_sig = f"SEG_{seg_id}_isCommsError"
-
-            v = self.data_log.get(v_sig, [])[-1][1] if self.data_log.get(v_sig) else None
-            t = self.data_log.get(t_sig, [])[-1][1] if self.data_log.get(t_sig) else None
-            f = self.data_log.get(f_sig, [])[-1][1] if self.data_log.get(f_sig) else None
-            cf = self.data_log.get(cf_sig, [])[-1][1] if self.data_log.get(cf_sig) else None
+            latest = self.store.latest
+            v, t, f, cf = (None if s is None else latest(s) for s in widget.signal_ids)
 
             widget.update_data(voltage=v, temp=t, is_faulted=f, is_comms_fault=cf)
 
         elif isinstance(widget, SystemInfoFrame):
-            v = self.data_log.get("BMS_Pack_Voltage", [])[-1][1] if self.data_log.get("BMS_Pack_Voltage") else None
-            c = self.data_log.get("BMS_Pack_Current", [])[-1][1] if self.data_log.get("BMS_Pack_Current") else None
-            soc = self.data_log.get("BMS_Pack_SoC", [])[-1][1] if self.data_log.get("BMS_Pack_SoC") else None
+            latest = self.store.latest
+            v, c, soc = (latest(s) for s in self._pack_signals)
             widget.update_values(v, c, soc)
-
-
-        if signal_name == self.plotted_signal_name:
-            self.update_plot()
+            widget.update_pack_stats(self.pack.stats())
 
     def on_segment_selected(self, seg_id: int):
         col = seg_id - 1
@@ -791,6 +1192,11 @@ class Application(tk.Tk):
             self.segments[col].config(relief="solid", borderwidth=3)
 
     def on_cell_selected(self, cell_id: tuple):
+        if self.cell_grid is not None:
+            self.selected_cell_id = cell_id
+            self.cell_grid.select(cell_id)
+            return
+
         if self.selected_cell_id:
             old_row, old_col = self.selected_cell_id
             if self.cells[old_row][old_col]:
@@ -802,25 +1208,33 @@ class Application(tk.Tk):
             self.cells[new_row][new_col].config(relief="solid", borderwidth=3)
 
     def on_signal_selected_for_plot(self, signal_name: str):
-        self.plotted_signal_name = signal_name
+        self.subscribe("plot", [signal_name])
+        self.plotted_signal = self.store.ids.get(signal_name)
         self.update_plot()
 
     def update_plot(self):
         self.ax.cla()
         self._apply_plot_theme()
 
-        if self.plotted_signal_name:
-            signal_data = self.data_log.get(self.plotted_signal_name, [])
-            signal_unit = self.data_units.get(self.plotted_signal_name, "")
-
-            self.ax.set_title(f"{self.plotted_signal_name}")
+        if self.plotted_signal is not None:
+            span = PLOT_SPANS[self.plot_span.get()]
+            if span == 0:
+                times, values = self.store.series(self.plotted_signal, last=500)
+                lo = hi = values
+            else:
+                # Raw samples or min/max/mean buckets, whichever covers the span at screen resolution
+                times, lo, hi, values = self.store.history(self.plotted_signal, span, PLOT_MAX_POINTS)
+            signal_name = self.store.names[self.plotted_signal]
+            signal_unit = self.data_units.get(signal_name, "")
+
+            self.ax.set_title(f"{signal_name}")
             self.ax.set_ylabel(signal_unit if signal_unit else "Value")
 
-            if signal_data:
-                if len(signal_data) > 500:
-                    signal_data = signal_data[-500:]
-                times, values = zip(*signal_data)
-                self.ax.plot(times, values, '.-')
+            if len(times) and lo is not hi:
+                self.ax.fill_between(times, lo, hi, step="post", alpha=0.3)
+                self.ax.plot(times, values, '-', drawstyle="steps-post")
+            elif len(times):
+                self.ax.plot(times.copy(), values.copy(), '.-')
         else:
             self.ax.set_title("Click a value to plot")
 
@@ -829,8 +1243,13 @@ class Application(tk.Tk):
         self.canvas.draw()
 
     def on_closing(self):
+        self.tick_scheduler.stop()
         if self.notifier:
             self.notifier.stop()
+        self.ingest.stop()
+        if self.store.session is not None:
+            self.store.persist()
+            self.store.session.close()
         if self.bus:
             self.bus.shutdown()
         if self.log_file:
@@ -842,12 +1261,35 @@ def main():
     usb_can_path = "/dev/serial/by-id/usb-WeAct_Studio_USB2CANV1_ComPort_AAA120643984-if00"
     dbc_filepath = "./databases/bms_can_database.dbc"
     bitrate = 250000
+    ingest_mode = "async"       # "thread", or "process" to run bus, logging and decoding on a second core
+    queue_size = 50000          # frames buffered for decoding, the log file never waits on this
+    overflow_policy = "drop_oldest"     # or "drop_newest" / "latest_per_id" / "drop_display"
+    dbc_filter = False          # only accept frame IDs in the DBC, sheds unrelated traffic on a shared bus
+    allow_ids = []              # extra frame IDs to accept with dbc_filter, e.g. [0x7E8]
+    history_capacity = 8192     # samples kept per signal, memory stays flat however long the session
+    history_dir = "history"     # full-resolution session history on disk, None to keep RAM only
+    grid_renderer = "canvas"    # cell grid on one canvas, or "widgets" for a CellWidget per cell
+    # Tile colour ramps, name -> (low value, high value, low colour, high colour), see color_scale.DEFAULT_SCALES
+    color_scales = {
+        # "temperature": (10.0, 60.0, "#00FF00", "#FF0000"),
+    }
+    target_fps = 10             # GUI refresh rate, e.g. 5 on a weak laptop or 30 on a workstation
+    show_render_stats = False   # FPS / render time / ingest rate overlay in the toolbar
+
+    # Further buses captured alongside the BMS bus on one merged timeline (async ingest only)
+    extra_buses = [
+        # BusConfig("inverter", "/dev/serial/by-id/...", 500000, "./databases/hv500_can2_map_v24_EID_custom.dbc"),
+    ]
 
     if not Path(dbc_filepath).exists():
         print(f"Error: DBC file not found at '{dbc_filepath}'")
         return
 
-    app = Application(usb_can_path=usb_can_path, bitrate=bitrate, dbc_path=dbc_filepath)
+    app = Application(usb_can_path=usb_can_path, bitrate=bitrate, dbc_path=dbc_filepath, ingest_mode=ingest_mode,
+                      queue_size=queue_size, overflow_policy=overflow_policy, extra_buses=extra_buses,
+                      dbc_filter=dbc_filter, allow_ids=allow_ids, history_capacity=history_capacity,
+                      history_dir=history_dir, grid_renderer=grid_renderer,
+                      color_scales=color_scales, target_fps=target_fps, show_render_stats=show_render_stats)
     app.mainloop()
 
 
@@ -0,0 +1,140 @@
+import math
+import re
+import warnings
+
+import numpy as np
+
+
+NUM_SEGMENTS = 7
+CELLS_PER_SEGMENT = 16
+
+# Per-cell signals, in the order of the last axis of PackState.cells
+CELL_FIELDS = ("Voltage", "VoltageDiff", "Temp", "isDischarging", "isFaultDetected")
+VOLTAGE, VOLTAGE_DIFF, TEMP, DISCHARGING, FAULT = range(len(CELL_FIELDS))
+
+CELL_SIGNAL = re.compile(r"CELL_(\d+)x(\d+)_")
+SEGMENT_SIGNAL = re.compile(r"SEG_(\d+)_")
+
+
+def pack_topology(signal_names) -> tuple[int, int]:
+    """(segments, cells per segment) of the pack named by CELL_<seg>x<cell>_* and SEG_<seg>_* signals.
+
+    Falls back to NUM_SEGMENTS x CELLS_PER_SEGMENT when there are no cell signals.
+    """
+    segments = cells = 0
+    for name in signal_names:
+        match = CELL_SIGNAL.match(name)
+        if match:
+            segments = max(segments, int(match[1]))
+            cells = max(cells, int(match[2]))
+            continue
+        match = SEGMENT_SIGNAL.match(name)
+        if match:
+            segments = max(segments, int(match[1]))
+    if not cells:
+        return NUM_SEGMENTS, CELLS_PER_SEGMENT
+    return segments, cells
+
+
+class PackState:
+    """Latest value of every cell signal in one dense (segments, cells, fields) array.
+
+    The decode path writes CELL_<seg>x<cell>_<field> values in place through a
+    precomputed name -> flat index table, so pack-wide code (SoC, statistics, the
+    heat map) reads arrays instead of building 112 signal names. Cells that have
+    not reported yet are NaN.
+
+    With signal_ids (the SignalStore's table) update() and set() take signal IDs,
+    matching a FastDecoder built with the same table; otherwise names.
+    """
+    def __init__(self, segments: int = NUM_SEGMENTS, cells: int = CELLS_PER_SEGMENT, signal_ids: dict | None = None):
+        self.cells = np.full((segments, cells, len(CELL_FIELDS)), np.nan)
+        self._flat = self.cells.reshape(-1)
+        self.index = {
+            f"CELL_{seg + 1}x{cell + 1}_{field}": (seg * cells + cell) * len(CELL_FIELDS) + f
+            for seg in range(segments) for cell in range(cells) for f, field in enumerate(CELL_FIELDS)
+        }
+        if signal_ids is None:
+            self.slots = self.index
+        else:
+            self.slots = {signal_ids[name]: i for name, i in self.index.items() if name in signal_ids}
+        self.version = 0                # bumped by every update that touched a cell
+
+    @property
+    def signal_names(self) -> list:
+        return list(self.index)
+
+    @property
+    def voltage(self) -> np.ndarray:
+        return self.cells[:, :, VOLTAGE]
+
+    @property
+    def temp(self) -> np.ndarray:
+        return self.cells[:, :, TEMP]
+
+    def update(self, signals: dict):
+        """Take the cell signals out of a decoded frame, everything else is ignored."""
+        index = self.slots
+        flat = self._flat
+        touched = False
+        for name, value in signals.items():
+            i = index.get(name)
+            if i is not None:
+                flat[i] = value
+                touched = True
+        if touched:
+            self.version += 1
+
+    def set(self, key, value):
+        i = self.slots.get(key)
+        if i is not None:
+            self._flat[i] = value
+            self.version += 1
+
+    def cell(self, seg: int, cell: int) -> tuple:
+        """Field values of one cell (0-based), None for fields not seen yet."""
+        return tuple(None if math.isnan(v) else v for v in self.cells[seg, cell].tolist())
+
+    def min_voltage(self) -> float | None:
+        voltage = self.voltage
+        valid = voltage[~np.isnan(voltage)]
+        return float(valid.min()) if valid.size else None
+
+    def stats(self) -> dict | None:
+        """Pack-wide voltage and temperature statistics, None until a cell voltage arrived."""
+        voltage = self.voltage
+        seen = ~np.isnan(voltage)
+        if not seen.any():
+            return None
+        valid = voltage[seen]
+        v_min, v_max = float(valid.min()), float(valid.max())
+        seg, cell = divmod(int(np.nanargmin(voltage)), voltage.shape[1])
+
+        temp = self.temp
+        temp = temp[~np.isnan(temp)]
+        return {
+            "v_min": v_min,
+            "v_max": v_max,
+            "v_mean": float(valid.mean()),
+            "v_spread": v_max - v_min,
+            "v_min_cell": (seg + 1, cell + 1),      # 1-based, as in the signal names
+            "t_min": float(temp.min()) if temp.size else None,
+            "t_max": float(temp.max()) if temp.size else None,
+            "t_mean": float(temp.mean()) if temp.size else None,
+            "faults": int((self.cells[:, :, FAULT] > 0).sum()),
+            "discharging": int((self.cells[:, :, DISCHARGING] > 0).sum()),
+        }
+
+    def segment_stats(self) -> dict:
+        """Per-segment voltage and temperature aggregates, arrays of length segments (NaN if no data)."""
+        voltage, temp = self.voltage, self.temp
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)     # all-NaN segments
+            return {
+                "v_min": np.nanmin(voltage, axis=1),
+                "v_max": np.nanmax(voltage, axis=1),
+                "v_mean": np.nanmean(voltage, axis=1),
+                "v_sum": np.nansum(voltage, axis=1),
+                "t_max": np.nanmax(temp, axis=1),
+                "t_mean": np.nanmean(temp, axis=1),
+            }
@@ -0,0 +1,111 @@
+import datetime
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+# One record per sample in every signal file: relative time and value, little endian
+SAMPLE_DTYPE = np.dtype([("t", "<f8"), ("v", "<f8")])
+
+
+class SessionHistory:
+    """Append-only on-disk history of one session: history/<session>/<signal>.f8.
+
+    Each signal file is a flat array of SAMPLE_DTYPE records. session.json next to
+    them lists the signals, their units and the dtype, so offline tools can open a
+    session with open_session() (or plain np.memmap) without decoding the CAN log again.
+
+    Samples are written in blocks by SignalStore.persist() from the ingest thread.
+    Readers map the files read-only with np.memmap, so a whole day of history costs
+    page cache, not Python memory.
+    """
+    def __init__(self, directory, units: dict | None = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.units = units or {}
+        self.counts = {}                # signal -> records written
+        self._files = {}
+        self._maps = {}                 # signal -> (records mapped, memmap)
+        self._listed = 0                # signals in session.json
+        self.created = datetime.datetime.now()
+        self.demo = False               # set once demo data is recorded, so the session can be told apart
+        self._listed_demo = False
+        self._write_index()
+
+    @classmethod
+    def create(cls, root: str = "history", units: dict | None = None) -> "SessionHistory":
+        """A new session directory named after the current time."""
+        return cls(Path(root) / datetime.datetime.now().strftime('%Y%m%d_%H%M%S'), units)
+
+    def path(self, name: str) -> Path:
+        return self.directory / f"{name}.f8"
+
+    def write(self, name: str, times: np.ndarray, values: np.ndarray):
+        f = self._files.get(name)
+        if f is None:
+            f = self._files[name] = open(self.path(name), "ab")
+            self.counts[name] = 0
+        records = np.empty(len(times), dtype=SAMPLE_DTYPE)
+        records["t"] = times
+        records["v"] = values
+        f.write(records.tobytes())
+        self.counts[name] += len(records)
+
+    def flush(self):
+        for f in self._files.values():
+            f.flush()
+        if len(self._files) != self._listed or self.demo != self._listed_demo:
+            self._write_index()
+
+    def read(self, name: str) -> np.ndarray:
+        """Read-only memmap of every flushed record of a signal (empty if none)."""
+        try:
+            count = os.path.getsize(self.path(name)) // SAMPLE_DTYPE.itemsize
+        except OSError:
+            count = 0
+        if not count:
+            return np.empty(0, dtype=SAMPLE_DTYPE)
+
+        mapped = self._maps.get(name)
+        if mapped is None or mapped[0] != count:
+            # The file grew since it was mapped, map the new length
+            mapped = self._maps[name] = (count, np.memmap(self.path(name), dtype=SAMPLE_DTYPE, mode="r", shape=(count,)))
+        return mapped[1]
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        self._maps = {}
+
+    def _write_index(self):
+        signals = sorted(self._files)
+        index = {
+            "created": self.created.isoformat(timespec="seconds"),
+            "demo": self.demo,
+            "dtype": [[name, SAMPLE_DTYPE[name].str] for name in SAMPLE_DTYPE.names],
+            "signals": {name: {"file": self.path(name).name, "unit": self.units.get(name)} for name in signals},
+        }
+        with open(self.directory / "session.json", "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+        self._listed = len(signals)
+        self._listed_demo = self.demo
+
+
+def open_session(directory) -> dict:
+    """Map every signal of a recorded session, returns {signal: records} (fields 't' and 'v')."""
+    directory = Path(directory)
+    with open(directory / "session.json", encoding="utf-8") as f:
+        index = json.load(f)
+    dtype = np.dtype([tuple(field) for field in index["dtype"]])
+
+    records = {}
+    for name, info in index["signals"].items():
+        path = directory / info["file"]
+        count = os.path.getsize(path) // dtype.itemsize
+        if count:
+            records[name] = np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+    return records
@@ -0,0 +1,428 @@
+import array
+
+import numpy as np
+
+from session_history import SessionHistory
+
+
+# Samples kept per signal by default (about 13 minutes of a 10 Hz signal)
+DEFAULT_CAPACITY = 8192
+
+# Downsampled history kept per signal: (bucket seconds, buckets kept)
+# 30 min of 1 s, 3 h of 10 s and 24 h of 60 s buckets
+DEFAULT_TIERS = ((1.0, 1800), (10.0, 1080), (60.0, 1440))
+
+# Rows are this much longer than capacity, see SignalStore
+_SLACK = 4
+
+
+class _Tier:
+    """min/max/mean buckets of one resolution: a fixed-size ring plus the bucket being filled.
+
+    Closed buckets are passed on to the next (coarser) tier, so only the finest
+    tier sees individual samples.
+    """
+    __slots__ = ("resolution", "capacity", "times", "lo", "hi", "mean", "end", "count", "next",
+                 "start", "bucket_end", "b_lo", "b_hi", "total", "n")
+
+    def __init__(self, resolution: float, capacity: int, next_tier=None):
+        self.resolution = resolution
+        self.capacity = capacity
+        length = capacity + capacity // _SLACK
+        self.times = np.empty(length)
+        self.lo = np.empty(length)
+        self.hi = np.empty(length)
+        self.mean = np.empty(length)
+        self.next = next_tier
+        self.reset()
+
+    def reset(self):
+        self.end = 0                    # next free bucket in the ring
+        self.count = 0                  # buckets ever closed
+        self.start = 0.0                # open bucket: start time, end time and running stats
+        self.bucket_end = float("-inf")
+        self.b_lo = self.b_hi = self.total = 0.0
+        self.n = 0
+        if self.next is not None:
+            self.next.reset()
+
+    def add(self, t: float, lo: float, hi: float, total: float, n: int):
+        """Add n samples starting at time t with the given min, max and sum."""
+        if t >= self.bucket_end or not self.n:
+            if self.n:
+                self._close()
+            self.start = t - t % self.resolution
+            self.bucket_end = self.start + self.resolution
+            self.b_lo, self.b_hi, self.total, self.n = lo, hi, total, n
+            return
+        if lo < self.b_lo:
+            self.b_lo = lo
+        if hi > self.b_hi:
+            self.b_hi = hi
+        self.total += total
+        self.n += n
+
+    def _close(self):
+        end = self.end
+        if end == len(self.times):
+            keep = self.capacity - 1
+            for column in (self.times, self.lo, self.hi, self.mean):
+                column[:keep] = column[end - keep:end]
+            end = keep
+        self.times[end] = self.start
+        self.lo[end] = self.b_lo
+        self.hi[end] = self.b_hi
+        self.mean[end] = self.total / self.n
+        self.end = end + 1
+        self.count += 1
+        if self.next is not None:
+            self.next.add(self.start, self.b_lo, self.b_hi, self.total, self.n)
+
+    def oldest(self) -> float:
+        """Start time of the oldest bucket still held."""
+        if self.end:
+            return self.times[max(0, self.end - self.capacity)]
+        return self.start if self.n else float("inf")
+
+    def complete(self) -> bool:
+        """True while no bucket has been dropped from the ring yet."""
+        return self.count <= self.capacity
+
+    def buckets(self, start_time: float) -> tuple:
+        """(times, lo, hi, mean) of the buckets from start_time on, including the open one."""
+        first = max(0, self.end - self.capacity)
+        i = first + int(np.searchsorted(self.times[first:self.end], start_time - self.resolution, side="right"))
+        columns = [column[i:self.end] for column in (self.times, self.lo, self.hi, self.mean)]
+        if self.n:
+            columns = [np.append(column, value) for column, value in
+                       zip(columns, (self.start, self.b_lo, self.b_hi, self.total / self.n))]
+        return tuple(columns)
+
+
+class _Row:
+    """Preallocated columns of one signal. array.array for fast scalar appends, NumPy views for slicing."""
+    __slots__ = ("times", "values", "times_view", "values_view", "end", "latest", "count", "persisted", "first_record", "tier")
+
+    def __init__(self, length: int, tiers):
+        self.times = array.array("d", bytes(8 * length))
+        self.values = array.array("d", bytes(8 * length))
+        self.times_view = np.frombuffer(self.times)
+        self.values_view = np.frombuffer(self.values)
+        self.end = 0                    # next free column
+        self.latest = None              # newest value as decoded (int stays int)
+        self.count = 0                  # samples ever appended
+        self.persisted = 0              # of those, written to the session history
+        self.first_record = 0           # session records from before the last clear()
+
+        # Finest tier, each links to the next coarser one
+        self.tier = None
+        for resolution, capacity in reversed(tiers):
+            self.tier = _Tier(resolution, capacity, self.tier)
+
+
+class SignalStore:
+    """History of every signal in preallocated float64 columns.
+
+    Each signal has a times column and a values column of capacity + capacity / 4
+    samples. They are allocated on its first sample and never resized. Appends fill
+    them linearly. When they are full, the newest capacity samples are moved back to
+    the start, which costs one memmove every capacity / 4 appends. The retained
+    samples are therefore always contiguous, so series() returns views. Memory never
+    exceeds 2 * 8 * 1.25 * capacity bytes per signal, however long the session runs.
+
+    Older history survives in downsampled tiers (see DEFAULT_TIERS). Each bucket holds
+    min/max/mean, and the tiers are updated as samples arrive. history() serves any
+    span from the finest level that covers it within a point budget, so a whole
+    charge cycle costs the same to plot as the last minute.
+
+    With a SessionHistory attached, persist() appends the samples added since the
+    last call to the session files and flushes them, and history() reads spans that
+    RAM no longer holds back from them at full resolution when they fit the point
+    budget. A row also writes its unsaved samples out before a compaction drops
+    them, so nothing is lost between persists.
+
+    Time queries bisect the (time-ordered) columns: between() slices a time range,
+    value_at() carries the last observation forward and aligned() samples several
+    signals on one time base. They reach into the session history for spans RAM
+    no longer holds.
+
+    Signals are interned at construction: ids maps each name to a dense integer ID,
+    names maps it back, and every method takes the ID. The decoder, pack state and
+    GUI resolve names once at startup and only use IDs on the hot path.
+
+    There is one writer (the ingest thread) and any number of readers. A view taken
+    just before a compaction can see shifted samples, so readers copy what they keep.
+    """
+    def __init__(self, signal_names, capacity: int = DEFAULT_CAPACITY, tiers=DEFAULT_TIERS,
+                 history: SessionHistory | None = None):
+        self.names = list(dict.fromkeys(signal_names))
+        self.capacity = capacity
+        self.row_length = capacity + capacity // _SLACK
+        self.tiers = tuple(tiers)
+        self.session = history
+        self.ids = {name: sid for sid, name in enumerate(self.names)}
+        self._rows = [None] * len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.ids
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def nbytes(self) -> int:
+        """Memory held by the allocated columns and tiers."""
+        per_row = 16 * self.row_length + sum(32 * (capacity + capacity // _SLACK) for _, capacity in self.tiers)
+        return sum(per_row for row in self._rows if row is not None)
+
+    def append(self, sid: int, t: float, value):
+        row = self._rows[sid]
+        if row is None:
+            row = self._rows[sid] = _Row(self.row_length, self.tiers)
+
+        tier = row.tier
+        if tier is not None:
+            if t < tier.bucket_end and tier.n:
+                # Same bucket as the previous sample, updated inline
+                if value < tier.b_lo:
+                    tier.b_lo = value
+                elif value > tier.b_hi:
+                    tier.b_hi = value
+                tier.total += value
+                tier.n += 1
+            else:
+                tier.add(t, value, value, value, 1)
+
+        end = row.end
+        if end == self.row_length:
+            end = self._compact(sid, row, self.capacity - 1)
+
+        row.times[end] = t
+        row.values[end] = value
+        row.end = end + 1
+        row.latest = value
+        row.count += 1
+
+    def extend(self, sid: int, times: np.ndarray, values: np.ndarray):
+        """Append time-ordered sample arrays in one copy."""
+        n = len(times)
+        if not n:
+            return
+        row = self._rows[sid]
+        if row is None:
+            row = self._rows[sid] = _Row(self.row_length, self.tiers)
+        row.latest = values[-1].item()
+
+        if row.tier is not None:
+            # One tier update per bucket the batch touches, not per sample
+            tier = row.tier
+            buckets = times // tier.resolution
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+            counts = np.diff(np.append(starts, n))
+            for start, lo, hi, total, count in zip(starts.tolist(), np.minimum.reduceat(values, starts).tolist(),
+                                                   np.maximum.reduceat(values, starts).tolist(),
+                                                   np.add.reduceat(values, starts).tolist(), counts.tolist()):
+                tier.add(times[start].item(), lo, hi, total, count)
+
+        count = row.count + n
+        if n > self.capacity:
+            if self.session is not None:
+                # Older samples of the batch never reach the row, straight to disk
+                self._persist_row(sid, row)
+                self.session.write(self.names[sid], times, values)
+                row.persisted = count
+            times, values = times[-self.capacity:], values[-self.capacity:]
+            n = self.capacity
+        end = row.end
+        if end + n > self.row_length:
+            end = self._compact(sid, row, self.capacity - n)
+
+        row.times_view[end:end + n] = times
+        row.values_view[end:end + n] = values
+        row.end = end + n
+        row.count = count
+
+    def latest(self, sid: int, default=None):
+        row = self._rows[sid]
+        if row is None or row.latest is None:
+            return default
+        return row.latest
+
+    def count(self, sid: int) -> int:
+        """Samples ever appended to a signal, including the ones no longer retained."""
+        row = self._rows[sid]
+        return 0 if row is None else row.count
+
+    def series(self, sid: int, last: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """(times, values) views of the retained samples, or of the newest `last` of them."""
+        row = self._rows[sid]
+        if row is None:
+            return np.empty(0), np.empty(0)
+        end = row.end
+        start = max(0, end - self.capacity)
+        if last is not None:
+            start = max(start, end - last)
+        return row.times_view[start:end], row.values_view[start:end]
+
+    def history(self, sid: int, span: float | None = None, max_points: int = 1000) -> tuple:
+        """(times, lo, hi, mean) of the last span seconds (everything held if None).
+
+        Raw samples when they cover the span within max_points (lo, hi and mean are
+        then the same array object), otherwise the finest tier that does. Tier times are
+        bucket start times.
+        """
+        row = self._rows[sid]
+        if row is None or not row.count:
+            empty = np.empty(0)
+            return empty, empty, empty, empty
+
+        times, values = self.series(sid)
+        newest = times[-1] if len(times) else row.tier.start
+        start_time = newest - span if span is not None else float("-inf")
+
+        if self._ram_covers(row, times, start_time):
+            i = int(np.searchsorted(times, start_time))
+            if len(times) - i <= max_points:
+                values = values[i:]
+                return times[i:], values, values, values
+
+        if self.session is not None and len(times):
+            records, i, j, a, b = self._disk_span(sid, row, times, start_time, float("inf"))
+            # Only if disk and RAM overlap, so together they hold every sample of the span
+            if len(records) and records["t"][-1] >= times[0] and (j - i) + (b - a) <= max_points:
+                times = np.concatenate((records["t"][i:j], times[a:b]))
+                values = np.concatenate((records["v"][i:j], values[a:b]))
+                return times, values, values, values
+
+        tier = row.tier
+        while tier is not None:
+            covers = tier.oldest() <= start_time or tier.complete() or tier.next is None
+            if span is None:
+                fits = min(tier.count, tier.capacity) + 1 <= max_points
+            else:
+                fits = span / tier.resolution <= max_points
+            if covers and (fits or tier.next is None):
+                return tier.buckets(start_time)
+            tier = tier.next
+
+        i = int(np.searchsorted(times, start_time))
+        values = values[i:]
+        return times[i:], values, values, values
+
+    def between(self, sid: int, t0: float, t1: float) -> tuple[np.ndarray, np.ndarray]:
+        """(times, values) of every sample with t0 <= t <= t1, located by bisection.
+
+        Views into RAM when it still holds t0, otherwise copies read from the session
+        history. Without a session only what RAM holds is returned.
+        """
+        row = self._rows[sid]
+        if row is None:
+            return np.empty(0), np.empty(0)
+        times, values = self.series(sid)
+        if self.session is None or self._ram_covers(row, times, t0):
+            i = int(np.searchsorted(times, t0))
+            j = int(np.searchsorted(times, t1, side="right"))
+            return times[i:j], values[i:j]
+
+        records, i, j, a, b = self._disk_span(sid, row, times, t0, t1)
+        return np.concatenate((records["t"][i:j], times[a:b])), np.concatenate((records["v"][i:j], values[a:b]))
+
+    def value_at(self, sid: int, t: float, default=None):
+        """Value of the last sample at or before t (last observation carried forward)."""
+        row = self._rows[sid]
+        if row is None:
+            return default
+        times, values = self.series(sid)
+        i = int(np.searchsorted(times, t, side="right"))
+        if i:
+            return values[i - 1].item()
+
+        # t is older than anything RAM holds
+        if self.session is not None:
+            records = self.session.read(self.names[sid])[row.first_record:]
+            i = int(np.searchsorted(records["t"], t, side="right"))
+            if i:
+                return records["v"][i - 1].item()
+        return default
+
+    def aligned(self, sids, times) -> np.ndarray:
+        """Values of several signals at the same ascending timestamps, shape (len(sids), len(times)).
+
+        Each entry is the signal's last sample at or before that time, NaN before its
+        first one. Useful for export, cursors and comparing signals of different rates.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        out = np.full((len(sids), len(times)), np.nan)
+        if not len(times):
+            return out
+        for k, sid in enumerate(sids):
+            t, v = self.between(sid, times[0], times[-1])
+            idx = np.searchsorted(t, times, side="right") - 1
+            seen = idx >= 0
+            out[k, seen] = v[idx[seen]]
+            if not seen.all():
+                # Before the first sample in range, carry in the one preceding it
+                before = self.value_at(sid, times[0])
+                if before is not None:
+                    out[k, ~seen] = before
+        return out
+
+    def persist(self):
+        """Append the samples added since the last call to the session history and flush it."""
+        if self.session is None:
+            return
+        for sid, row in enumerate(self._rows):
+            if row is not None:
+                self._persist_row(sid, row)
+        self.session.flush()
+
+    def _persist_row(self, sid: int, row: _Row):
+        new = min(row.count - row.persisted, row.end)
+        if new > 0:
+            self.session.write(self.names[sid], row.times_view[row.end - new:row.end], row.values_view[row.end - new:row.end])
+        # extend() may already have written past row.count (oversized batch), never go back
+        row.persisted = max(row.persisted, row.count)
+
+    def clear(self, sid: int):
+        row = self._rows[sid]
+        if row is not None:
+            if self.session is not None:
+                # The session file stays append-only: save what's pending, first_record hides it from queries
+                self._persist_row(sid, row)
+            row.end = 0
+            row.latest = None
+            row.count = 0
+            row.persisted = 0
+            if self.session is not None:
+                row.first_record = self.session.counts.get(self.names[sid], 0)
+            if row.tier is not None:
+                row.tier.reset()
+
+    def _ram_covers(self, row: _Row, times: np.ndarray, t: float) -> bool:
+        # Retained samples reach back to t, or nothing older was ever dropped
+        return bool(len(times)) and (times[0] <= t or row.count <= self.capacity)
+
+    def _disk_span(self, sid: int, row: _Row, times: np.ndarray, t0: float, t1: float) -> tuple:
+        """Session records of a signal and the bounds of [t0, t1] in them and in RAM.
+
+        Returns (records, i, j, a, b): records[i:j] plus RAM samples [a:b], the ones
+        newer than anything on disk (not persisted yet).
+        """
+        records = self.session.read(self.names[sid])[row.first_record:]
+        disk_times = records["t"]
+        i = int(np.searchsorted(disk_times, t0))
+        j = int(np.searchsorted(disk_times, t1, side="right"))
+        tail = int(np.searchsorted(times, disk_times[-1], side="right")) if len(records) else 0
+        a = max(tail, int(np.searchsorted(times, t0)))
+        b = max(a, int(np.searchsorted(times, t1, side="right")))
+        return records, i, j, a, b
+
+    def _compact(self, sid: int, row: _Row, keep: int) -> int:
+        """Move the newest `keep` samples of a row to its start, returns the new end."""
+        if self.session is not None:
+            self._persist_row(sid, row)
+        end = row.end
+        keep = max(0, min(keep, end))
+        for view in (row.times_view, row.values_view):
+            view[:keep] = view[end - keep:end]
+        row.end = keep
+        return keep
@@ -0,0 +1,50 @@
+import tempfile
+
+import numpy as np
+
+from session_history import SessionHistory, open_session
+from signal_store import SignalStore
+
+
+# Checks that SignalStore writes every sample to the session history exactly once, in time order
+
+capacity = 100
+
+with tempfile.TemporaryDirectory() as directory:
+    store = SignalStore(["V"], capacity=capacity, history=SessionHistory(directory))
+    sid = store.ids["V"]
+
+    # Scalar appends through several compactions
+    for i in range(1000):
+        store.append(sid, float(i), float(i))
+    store.persist()
+
+    # A batch larger than capacity goes straight to disk
+    times = np.arange(1000, 1300, dtype=np.float64)
+    store.extend(sid, times, times)
+    store.persist()
+
+    # And a few more after it
+    times = np.arange(1300, 1350, dtype=np.float64)
+    store.extend(sid, times, times)
+    store.persist()
+    assert store.count(sid) == 1350
+
+    t, v = store.between(sid, 250.0, 260.0)
+    assert np.array_equal(t, np.arange(250, 261)), t
+    assert store.value_at(sid, 500.5) == 500.0
+
+    # Samples not persisted yet still reach the file when the signal is cleared
+    for i in range(1350, 1370):
+        store.append(sid, float(i), float(i))
+    store.clear(sid)
+    store.persist()
+    assert store.count(sid) == 0
+    assert store.value_at(sid, 500.5) is None, "cleared history still visible"
+    store.session.close()
+
+    records = open_session(directory)["V"]
+    assert len(records) == 1370, len(records)
+    assert np.array_equal(records["t"], np.arange(1370)), "times not in order or duplicated"
+
+print("SignalStore session history: OK")
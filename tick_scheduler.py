@@ -0,0 +1,114 @@
+import time
+import tkinter as tk
+
+
+class TickScheduler:
+    """Runs a GUI tick on the Tk loop with a time budget and an adaptive interval.
+
+    tick(deadline) is called with a time.perf_counter() deadline and must return
+    (processed, remaining): how many items it handled and how many it left for later.
+
+    - work left over: reschedule almost immediately, so Tk gets to handle input in between
+    - work done: reschedule at the target refresh rate
+    - nothing to do: back off exponentially up to idle_interval_ms to save wakeups
+
+    A frame is the run of ticks from the first one with work to the one that leaves
+    nothing behind. Peak tick time, frames per second and render time per frame are
+    measured over windows closed by roll_window(); stats() reports the last closed one
+    and can be called any number of times.
+    """
+    def __init__(self, root: tk.Misc, tick, budget_ms: float = 8.0, target_hz: float = 10.0,
+                 idle_interval_ms: int = 500, queue_depth=None):
+        self.root = root
+        self.tick = tick
+        self.budget = budget_ms / 1000
+        self.target_hz = target_hz
+        self.interval_ms = max(1, int(1000 / target_hz))
+        self.idle_interval_ms = max(idle_interval_ms, self.interval_ms)
+        self.queue_depth = queue_depth      # optional callable, reported in stats()
+
+        self._idle_ticks = 0
+        self._after_id = None
+        self._next_interval_ms = self.interval_ms
+        self._last_tick_ms = 0.0
+        self._max_tick_ms = 0.0
+        self._backlog = 0
+        self._frame_ms = 0.0            # render time of the frame in progress
+        self._frames = 0                # frames finished in the current window
+        self._frames_ms = 0.0           # their render time
+        self._stats_time = time.perf_counter()
+        self._window = {"max_tick_ms": 0.0, "fps": 0.0, "frame_ms": 0.0}     # last closed window
+
+    def start(self, delay_ms: int | None = None):
+        self._after_id = self.root.after(self.interval_ms if delay_ms is None else delay_ms, self._run)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def wake(self):
+        """Work was queued outside tick(): run the next tick now instead of after an idle backoff."""
+        self._idle_ticks = 0
+        if self._after_id is not None and self._next_interval_ms > self.interval_ms:
+            self.root.after_cancel(self._after_id)
+            self._next_interval_ms = self.interval_ms
+            self._after_id = self.root.after(1, self._run)
+
+    def set_rate(self, target_hz: float):
+        """Change the target refresh rate, from the next tick on."""
+        self.target_hz = target_hz
+        self.interval_ms = max(1, int(1000 / target_hz))
+        self.idle_interval_ms = max(self.idle_interval_ms, self.interval_ms)
+
+    def roll_window(self):
+        """Close the current measurement window and start a new one; called by the one stats display."""
+        now = time.perf_counter()
+        self._window = {
+            "max_tick_ms": self._max_tick_ms,
+            "fps": self._frames / (now - self._stats_time),
+            "frame_ms": self._frames_ms / self._frames if self._frames else 0.0,
+        }
+        self._max_tick_ms = 0.0
+        self._frames = 0
+        self._frames_ms = 0.0
+        self._stats_time = now
+
+    def stats(self) -> dict:
+        """Tick timing, frame rate and backlog; max_tick_ms, fps and frame_ms cover the last closed window."""
+        return dict(
+            self._window,
+            tick_ms=self._last_tick_ms,
+            interval_ms=self._next_interval_ms,
+            backlog=self._backlog,
+            queue_depth=self.queue_depth() if self.queue_depth else 0,
+        )
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            processed, remaining = self.tick(start + self.budget)
+        except Exception as e:
+            print(f"Error in GUI tick: {e}")
+            processed, remaining = 0, 0
+
+        self._last_tick_ms = (time.perf_counter() - start) * 1000
+        self._max_tick_ms = max(self._max_tick_ms, self._last_tick_ms)
+        self._backlog = remaining
+
+        if remaining:
+            self._idle_ticks = 0
+            self._frame_ms += self._last_tick_ms
+            interval = 1
+        elif processed:
+            self._idle_ticks = 0
+            self._frames += 1
+            self._frames_ms += self._frame_ms + self._last_tick_ms
+            self._frame_ms = 0.0
+            interval = self.interval_ms
+        else:
+            self._idle_ticks += 1
+            interval = min(self.interval_ms << min(self._idle_ticks, 8), self.idle_interval_ms)
+
+        self._next_interval_ms = interval
+        self._after_id = self.root.after(interval, self._run)